@@ -17,16 +17,147 @@ return q.head(15)
 """
 
 import argparse
+import copy
+import functools
 import logging
+import re
 import sys
 import traceback
 
-from antlr4 import ParseTreeWalker
-from queryparser.adql.adqltranslator import ADQLQueryTranslator, FormatListener, SelectQueryListener
+from antlr4 import CommonTokenStream, InputStream, ParseTreeWalker, Token
+from antlr4.atn.PredictionMode import PredictionMode
+from antlr4.error.Errors import ParseCancellationException
+from antlr4.error.ErrorStrategy import BailErrorStrategy, DefaultErrorStrategy
+from queryparser.adql.ADQLLexer import ADQLLexer
+from queryparser.adql.ADQLParser import ADQLParser
+from queryparser.adql.adqltranslator import (
+    ADQLQueryTranslator,
+    FormatListener,
+    SelectQueryListener,
+    SyntaxErrorListener,
+)
+from queryparser.exceptions import QuerySyntaxError
 
 logger = logging.getLogger(__name__)
 
 
+# Tokens relevant to the structural pre-checks in _precheck_adql().  String
+# literals, delimited identifiers and comments are matched (and skipped) first,
+# so that their contents are never mistaken for function calls or parentheses.
+_PRECHECK_RE = re.compile(
+    r"""
+    '(?:[^']|'')*'
+    | "(?:[^"]|"")*"
+    | --[^\n]*
+    | \b(?P<contains>CONTAINS)\s*\(
+    | \b(?P<geometry>POINT|CIRCLE|POLYGON)\s*\(\s*(?:'(?P<frame>(?:[^']|'')*)')?
+    | (?P<open>\()
+    | (?P<close>\))
+    """,
+    re.IGNORECASE | re.VERBOSE,
+)
+
+# An unsigned or signed numeric literal, including scientific notation
+# (e.g. '1.2e-3').  Unlike float(), this does not accept 'nan', 'inf' or
+# 'infinity', which in ADQL are identifiers rather than numbers.
+_NUMBER_RE = re.compile(r"[+-]?(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?")
+
+# The row count of a TOP or LIMIT clause
+_LIMIT_RE = re.compile(r"(?:LIMIT|TOP)\s+(\d+)", re.IGNORECASE)
+
+# Runs of whitespace, or string literals, delimited identifiers and comments
+# (which _normalize_adql() leaves as they are)
+_WHITESPACE_RE = re.compile(r"""'(?:[^']|'')*'|"(?:[^"]|"")*"|--[^\n]*\n?|(?P<space>\s+)""")
+
+
+def _normalize_adql(adql: str) -> str:
+    """
+    Collapse whitespace outside literals and comments, giving a parse cache key.
+
+    Whitespace between tokens does not change what a query means, so queries
+    that differ only in layout (e.g. re-indented by a client) share a cache entry.
+    """
+    return _WHITESPACE_RE.sub(lambda m: " " if m.group("space") else m.group(0), adql).strip()
+
+
+def _precheck_adql(adql: str):
+    """
+    Reject unsupported uses of geometry functions before running the parser.
+
+    This applies the same rules as LSDBFormatListener (a single CONTAINS, with
+    POINT, CIRCLE and POLYGON only inside it, in the ICRS frame) with a single
+    regex scan, so that such queries fail without paying for a full parse.
+    Anything that this scan cannot decide is left to the parser.
+
+    Raises:
+        ValueError: If there are several CONTAINS clauses, or geometry
+            functions outside of CONTAINS
+        NotImplementedError: If a coordinate system other than ICRS is used
+    """
+    depth = 0
+    # Parenthesis depth of the open CONTAINS( call, if any
+    contains_depth = None
+    seen_contains = False
+    for match in _PRECHECK_RE.finditer(adql):
+        if match["contains"]:
+            if seen_contains:
+                raise ValueError("Multiple CONTAINS clauses are not supported")
+            seen_contains = True
+            depth += 1
+            contains_depth = depth
+        elif match["geometry"]:
+            function = match["geometry"].upper()
+            if contains_depth is None:
+                raise ValueError(f"Cannot translate uses of {function} outside of CONTAINS")
+            frame = match["frame"]
+            if frame is not None and frame.upper() != "ICRS":
+                raise NotImplementedError(f"Only 'ICRS' coordinate system is supported, got '{frame}'")
+            depth += 1
+        elif match["open"]:
+            depth += 1
+        elif match["close"]:
+            if depth == contains_depth:
+                contains_depth = None
+            depth -= 1
+
+
+class TwoStageADQLQueryTranslator(ADQLQueryTranslator):
+    """
+    ADQLQueryTranslator that parses with ANTLR's two-stage strategy.
+
+    The query is first parsed in SLL prediction mode, bailing out at the first
+    error.  SLL prediction is much cheaper than the full LL prediction that
+    queryparser uses, and it succeeds for practically every valid query.  Only
+    if it fails is the query parsed again in full LL mode, with the default
+    error recovery, so genuine syntax errors are reported exactly as before.
+    """
+
+    def parse(self):
+        """Parse the input query and store the output in self.tree."""
+        lexer = ADQLLexer(InputStream(self.query))
+        self.stream = CommonTokenStream(lexer)
+        self.parser = ADQLParser(self.stream)
+        self.syntax_error_listener = SyntaxErrorListener()
+        self.parser._listeners = [self.syntax_error_listener]
+
+        self.parser._interp.predictionMode = PredictionMode.SLL
+        self.parser._errHandler = BailErrorStrategy()
+        try:
+            self.tree = self.parser.query()
+        except ParseCancellationException:
+            # Either a syntax error or a query that needs full LL prediction
+            self.syntax_error_listener.syntax_errors.clear()
+            self.parser._errHandler = DefaultErrorStrategy()
+            self.parser.reset()
+            self.parser._interp.predictionMode = PredictionMode.LL
+            self.tree = self.parser.query()
+
+        if self.syntax_error_listener.syntax_errors:
+            raise QuerySyntaxError(self.syntax_error_listener.syntax_errors)
+
+        self.walker = ParseTreeWalker()
+
+
 class LSDBFormatListener(FormatListener):
     """
     Listens to parsing events from a known subset of ADQL, building up the data in these
@@ -190,13 +321,17 @@ class LSDBFormatListener(FormatListener):
         args = self._merge_expression(args)
         return args
 
-    def _extract_values_from_node(self, node):
+    def _extract_values_from_node(self, node, values=None):
         """Recursively extract values from a parse tree node."""
-        values = []
+        # Terminal values are appended to a single list shared by the whole
+        # traversal, so deeply nested arguments (e.g. '((((270.0))))') are
+        # collected in linear time instead of being re-copied at every level.
+        if values is None:
+            values = []
 
         if hasattr(node, "children"):
             for child in node.children:
-                values.extend(self._extract_values_from_node(child))
+                self._extract_values_from_node(child, values)
         else:
             # Terminal node
             # Never mind punctuation like commas or parentheses
@@ -229,12 +364,9 @@ class LSDBFormatListener(FormatListener):
                 i += 1
         return merged
 
-    def _looks_like_number(self, s: str) -> bool:
-        try:
-            float(s)
-            return True
-        except ValueError:
-            return False
+    @staticmethod
+    def _looks_like_number(s: str) -> bool:
+        return _NUMBER_RE.fullmatch(s) is not None
 
     def _validate_coord_system(self, coord_system_arg):
         """
@@ -311,11 +443,8 @@ class LSDBFormatListener(FormatListener):
         # limit_contexts is a dictionary where values contain the limit info
         if self.limit_contexts:
             for limit_text in self.limit_contexts.values():
-                # Extract number specifically from LIMIT/TOP clause patterns
-                import re
-
                 # Match "LIMIT n" or "TOP n" patterns specifically
-                match = re.search(r"(?:LIMIT|TOP)\s+(\d+)", limit_text, re.IGNORECASE)
+                match = _LIMIT_RE.search(limit_text)
                 if match:
                     try:
                         limit_value = int(match.group(1))
@@ -395,12 +524,14 @@ class LSDBFormatListener(FormatListener):
                     return (column, py_operator, value)
         return None
 
-    def _translate_operator(self, sql_operator):
+    @staticmethod
+    def _translate_operator(sql_operator):
         """Translate SQL operators to Python operators."""
         operator_map = {"=": "==", "<>": "!=", "!=": "!=", "<": "<", ">": ">", "<=": "<=", ">=": ">="}
         return operator_map.get(sql_operator, sql_operator)
 
-    def _parse_value(self, value_text):
+    @staticmethod
+    def _parse_value(value_text):
         """Parse a value, handling strings, numbers (incl. negative and scientific), etc."""
         # Remove quotes from string literals
         if value_text.startswith("'") and value_text.endswith("'"):
@@ -408,17 +539,17 @@ class LSDBFormatListener(FormatListener):
         if value_text.startswith('"') and value_text.endswith('"'):
             return value_text[1:-1]  # Remove double quotes
 
-        # Try to parse as number (int or float, including scientific notation)
-        try:
-            f = float(value_text)
-            if f == int(f):
-                return int(f)
-            else:
-                return f
-        except ValueError:
-            # Return as string if not a number
+        # Return as string if not a number
+        if not LSDBFormatListener._looks_like_number(value_text):
             return value_text
 
+        # Parse as number (int or float, including scientific notation)
+        f = float(value_text)
+        if f == int(f):
+            return int(f)
+        else:
+            return f
+
     def enterFrom_clause(self, ctx):
         """Extract table names from the FROM clause."""
         # Check for unsupported constructs first
@@ -538,6 +669,267 @@ class LSDBFormatListener(FormatListener):
         return self.entities
 
 
+# Tokens of the ADQL subset handled by _SubsetParser.  Anything else (comments,
+# delimited identifiers, strings with escaped quotes, other operators) matches
+# the 'other' group and sends the query to the full parser.  As in the ADQL
+# lexer, only numbers with a decimal point may have an exponent.
+_SUBSET_TOKEN_RE = re.compile(
+    r"""
+    (?P<space>\s+)
+    | (?P<string>'[^']*')(?!')
+    | (?P<number>(?:\d+\.\d*|\.\d+)(?:[eE][+-]?\d+)?|\d+)(?![\w.])
+    | (?P<word>[A-Za-z_]\w*)
+    | (?P<op><=|>=|<>|[=<>])
+    | (?P<punct>[(),.+*-])
+    | (?P<other>.)
+    """,
+    re.VERBOSE | re.DOTALL | re.ASCII,
+)
+
+# Keywords that LSDBFormatListener.enterFrom_clause rejects in a FROM clause
+_UNSUPPORTED_FROM_KEYWORDS = ("JOIN", "INNER", "LEFT", "RIGHT", "OUTER", "CROSS", "UNION")
+
+
+@functools.lru_cache(maxsize=1024)
+def _is_regular_identifier(word: str) -> bool:
+    """Check whether the ADQL lexer reads ``word`` as an identifier, rather than a keyword."""
+    lexer = ADQLLexer(InputStream(word))
+    token = lexer.nextToken()
+    return token.type == ADQLLexer.ID and lexer.nextToken().type == Token.EOF
+
+
+class _SubsetError(Exception):
+    """Raised by _SubsetParser for queries outside the subset that it handles."""
+
+
+class _SubsetParser:
+    """
+    Recursive-descent parser for the narrow subset of ADQL that the server supports.
+
+    It handles queries of the form
+
+        SELECT [TOP n] col, ... FROM table
+        [WHERE predicate AND ...]
+        [ORDER BY col [ASC|DESC], ...]
+
+    where each predicate is either ``col <op> literal`` or one CONTAINS of a
+    POINT in a CIRCLE or POLYGON, compared to 1.  It produces the same entities
+    as walking the ANTLR parse tree with LSDBFormatListener, without building
+    the tree, and raises _SubsetError for anything else, including queries that
+    the full parser would reject, so that they get the full parser's handling.
+    """
+
+    def __init__(self, adql: str):
+        self.tokens = []
+        for match in _SUBSET_TOKEN_RE.finditer(adql):
+            kind = match.lastgroup
+            if kind == "other":
+                raise _SubsetError(match.group())
+            if kind != "space":
+                self.tokens.append((kind, match.group()))
+        self.pos = 0
+        self.entities = {
+            "tables": [],
+            "columns": [],
+            "spatial_search": None,
+            "conditions": [],
+            "limits": None,
+            "order_by": [],
+        }
+
+    def _peek(self):
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else (None, None)
+
+    def _next(self):
+        token = self._peek()
+        if token[0] is None:
+            raise _SubsetError("unexpected end of query")
+        self.pos += 1
+        return token
+
+    def _accept_keyword(self, keyword, match_case=False):
+        kind, text = self._peek()
+        if kind == "word" and (text if match_case else text.upper()) == keyword:
+            self.pos += 1
+            return True
+        return False
+
+    def _expect_keyword(self, keyword, match_case=False):
+        if not self._accept_keyword(keyword, match_case):
+            raise _SubsetError(f"expected {keyword}")
+
+    def _expect(self, text):
+        if self._next()[1] != text:
+            raise _SubsetError(f"expected '{text}'")
+
+    def _identifier(self):
+        """Parse an identifier, optionally qualified as ``prefix.name``, as written."""
+        name = self._word()
+        if self._peek()[1] == ".":
+            self.pos += 1
+            name += "." + self._word()
+        return name
+
+    def _word(self):
+        kind, text = self._next()
+        if kind != "word" or not _is_regular_identifier(text):
+            raise _SubsetError(text)
+        return text
+
+    def _number(self):
+        """Parse a numeric literal with an optional sign, as text."""
+        kind, text = self._next()
+        if text in ("+", "-"):
+            sign = text
+            kind, text = self._next()
+            text = sign + text
+        if kind != "number":
+            raise _SubsetError(text)
+        return text
+
+    def parse(self) -> dict:
+        """Parse the whole query and return its entities."""
+        self._expect_keyword("SELECT")
+        if self._accept_keyword("TOP"):
+            kind, text = self._next()
+            if kind != "number" or not text.isdigit() or int(text) <= 0:
+                raise _SubsetError(text)
+            self.entities["limits"] = int(text)
+
+        self.entities["columns"].append(self._identifier())
+        while self._peek()[1] == ",":
+            self.pos += 1
+            self.entities["columns"].append(self._identifier())
+
+        self._expect_keyword("FROM")
+        table = self._identifier()
+        if any(keyword in table.upper() for keyword in _UNSUPPORTED_FROM_KEYWORDS):
+            raise _SubsetError(table)
+        self.entities["tables"].append(table)
+
+        if self._accept_keyword("WHERE"):
+            self._predicate()
+            while self._accept_keyword("AND"):
+                self._predicate()
+
+        # LSDBFormatListener only accepts ORDER BY in upper case
+        if self._accept_keyword("ORDER", match_case=True):
+            self._expect_keyword("BY", match_case=True)
+            self._sort_key()
+            while self._peek()[1] == ",":
+                self.pos += 1
+                self._sort_key()
+
+        if self._peek()[0] is not None:
+            raise _SubsetError(self._peek()[1])
+        return self.entities
+
+    def _predicate(self):
+        kind, text = self._peek()
+        if kind == "number":
+            # 1 = CONTAINS(...)
+            self._expect("1")
+            self._expect("=")
+            self._contains()
+        elif kind == "word" and text.upper() == "CONTAINS":
+            # CONTAINS(...) = 1
+            self._contains()
+            self._expect("=")
+            self._expect("1")
+        else:
+            self._comparison()
+
+    def _comparison(self):
+        column = self._identifier()
+        kind, operator = self._next()
+        if kind != "op":
+            raise _SubsetError(operator)
+        kind, value = self._peek()
+        if kind == "string":
+            self.pos += 1
+        else:
+            value = self._number()
+        # The listener skips any comparison mentioning CONTAINS
+        if "CONTAINS" in column.upper() or "CONTAINS" in value.upper():
+            raise _SubsetError(column)
+        self.entities["conditions"].append(
+            (
+                column,
+                LSDBFormatListener._translate_operator(operator),
+                LSDBFormatListener._parse_value(value),
+            )
+        )
+
+    def _contains(self):
+        if self.entities["spatial_search"] is not None:
+            raise _SubsetError("multiple CONTAINS")
+        self._expect_keyword("CONTAINS")
+        self._expect("(")
+
+        self._expect_keyword("POINT")
+        self._expect("(")
+        self._coord_system()
+        self._expect(",")
+        ra_column = self._word()
+        self._expect(",")
+        dec_column = self._word()
+        self._expect(")")
+        if ra_column not in self.entities["columns"] or dec_column not in self.entities["columns"]:
+            raise _SubsetError("POINT columns not selected")
+        self._expect(",")
+
+        if self._accept_keyword("CIRCLE"):
+            values = self._shape_arguments()
+            if len(values) != 3:
+                raise _SubsetError("CIRCLE arguments")
+            ra, dec, radius = values
+            self.entities["spatial_search"] = {"type": "ConeSearch", "ra": ra, "dec": dec, "radius": radius}
+        elif self._accept_keyword("POLYGON"):
+            values = self._shape_arguments()
+            if len(values) < 6 or len(values) % 2:
+                raise _SubsetError("POLYGON arguments")
+            self.entities["spatial_search"] = {
+                "type": "PolygonSearch",
+                "coordinates": list(zip(values[::2], values[1::2], strict=True)),
+            }
+        else:
+            raise _SubsetError(self._peek()[1])
+        self._expect(")")
+
+    def _coord_system(self):
+        kind, text = self._next()
+        if kind != "string" or text[1:-1].upper() != "ICRS":
+            raise _SubsetError(text)
+
+    def _shape_arguments(self):
+        """Parse the ('ICRS', x, y, ...) arguments of CIRCLE or POLYGON into floats."""
+        self._expect("(")
+        self._coord_system()
+        values = []
+        while self._peek()[1] == ",":
+            self.pos += 1
+            values.append(float(self._number()))
+        self._expect(")")
+        return values
+
+    def _sort_key(self):
+        column = self._word()
+        ascending = True
+        if self._accept_keyword("DESC"):
+            ascending = False
+        else:
+            self._accept_keyword("ASC")
+        self.entities["order_by"].append((column, ascending))
+
+
+def _parse_adql_subset(adql: str) -> dict | None:
+    """Parse a query with _SubsetParser, or return None if it is outside the subset."""
+    try:
+        return _SubsetParser(adql).parse()
+    except _SubsetError:
+        return None
+
+
 def parse_adql_entities(adql: str) -> dict:
     """
     Parse ADQL query and extract the six entities of interest:
@@ -548,30 +940,96 @@ def parse_adql_entities(adql: str) -> dict:
     - limits: Row limit information
     - order_by: List of columns to order the results by
 
+    Results are memoized per query, ignoring differences in whitespace, since
+    building the ANTLR parse tree dominates the cost of a call; each call returns
+    its own copy, which callers are free to modify.  Call
+    ``parse_adql_entities.cache_clear()`` to drop them.
+
     Returns:
         dict: Dictionary containing the extracted entities
 
     Raises:
         NotImplementedError: If unsupported SQL constructs are found
     """
+    key = _normalize_adql(adql)
     try:
-        translator = ADQLQueryTranslator(adql)
-        walker = ParseTreeWalker()
-        select_query_listener = SelectQueryListener()
-        walker.walk(select_query_listener, translator.tree)
-
-        my_listener = LSDBFormatListener(
-            translator.parser, contexts={}, limit_contexts=select_query_listener.limit_contexts
-        )
-        walker.walk(my_listener, translator.tree)
-
-        return my_listener.get_entities()
+        entities = _parse_adql_entities_cached(key)
+    except (ValueError, NotImplementedError):
+        if key == adql:
+            raise
+        # Syntax errors carry line and column numbers, so report them against
+        # the query as it was written
+        _parse_adql_entities_cached.__wrapped__(adql)
+        raise
+    return copy.deepcopy(entities)
+
+
+@functools.lru_cache(maxsize=256)
+def _parse_adql_entities_cached(adql: str) -> dict:
+    """Parse an ADQL query into its entities; failures raise, so they are never cached."""
+    try:
+        _precheck_adql(adql)
+        # Most queries are in the small subset that _SubsetParser handles
+        # directly; only the others pay for a full ANTLR parse.
+        entities = _parse_adql_subset(adql)
+        if entities is not None:
+            return entities
+        return _parse_with_antlr(adql)
     except NotImplementedError as e:
         raise NotImplementedError("Unimplemented ADQL feature") from e
     except Exception as e:
         raise ValueError(f"Failed to parse ADQL query: {e}") from e
 
 
+def _parse_with_antlr(adql: str) -> dict:
+    """Parse an ADQL query into its entities by walking its full ANTLR parse tree."""
+    translator = TwoStageADQLQueryTranslator(adql)
+    walker = ParseTreeWalker()
+    select_query_listener = SelectQueryListener()
+    walker.walk(select_query_listener, translator.tree)
+
+    my_listener = LSDBFormatListener(
+        translator.parser, contexts={}, limit_contexts=select_query_listener.limit_contexts
+    )
+    walker.walk(my_listener, translator.tree)
+
+    return my_listener.get_entities()
+
+
+parse_adql_entities.cache_clear = _parse_adql_entities_cached.cache_clear
+
+
+# Representative queries covering the constructs the listener supports
+_WARM_UP_QUERIES = (
+    """
+    SELECT TOP 10 source_id, ra, dec, phot_g_mean_mag
+    FROM gaia_dr3.gaia
+    WHERE 1 = CONTAINS(POINT('ICRS', ra, dec), CIRCLE('ICRS', 270.0, -23.0, 0.25))
+    AND phot_g_mean_mag < 16 AND phot_variable_flag = 'VARIABLE'
+    ORDER BY ra ASC, dec DESC
+    """,
+    """
+    SELECT objra, objdec, mag
+    FROM ztf_dr22
+    WHERE CONTAINS(POINT('ICRS', objra, objdec), POLYGON('ICRS', 280.0, 30.0, 281.0, 30.0, 281.0, 29.0)) = 1
+    AND mag >= -3.5
+    """,
+)
+
+
+def warm_up_parser():
+    """
+    Parse a few representative queries, without caching their results.
+
+    The ANTLR parser builds its prediction (DFA) cache lazily and shares it
+    across all parser instances in the process, so the first queries after
+    start-up are several times slower than later ones.  Calling this once at
+    start-up moves that cost out of the first client requests.
+    """
+    for adql in _WARM_UP_QUERIES:
+        _parse_with_antlr(adql)
+
+
 def format_lsdb_code(entities: dict) -> str:
     """
     Convert parsed ADQL entities to Python code that uses LSDB calls.
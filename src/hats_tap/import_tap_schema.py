@@ -20,6 +20,8 @@ Reference:
 import argparse
 import logging
 import sys
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any
 
 import pyvo
 
@@ -35,16 +37,19 @@ class TAPSchemaImporter:
     Imports TAP_SCHEMA metadata from an external TAP server into local database.
     """
 
-    def __init__(self, tap_url: str, db_path: str = "tap_schema.db"):
+    def __init__(self, tap_url: str, db_path: str = "tap_schema.db", workers: int = 8):
         """
         Initialize the TAP schema importer.
 
         Args:
             tap_url: URL of the external TAP server
             db_path: Path to local SQLite database
+            workers: Maximum number of TAP_SCHEMA queries to run concurrently
+                    when importing the columns and keys of several tables
         """
         self.tap_url = tap_url
         self.db_path = db_path
+        self.workers = workers
         self.service = None
         self.db = None
 
@@ -138,6 +143,36 @@ class TAPSchemaImporter:
             logger.debug(f"Query was: {query}")
             raise
 
+    def _query_all(self, func, items: list) -> list:
+        """
+        Call ``func`` for each item, running up to ``self.workers`` calls concurrently.
+
+        The calls only query the TAP server (sharing one service and its HTTP
+        session); results are returned in the order of ``items`` so that the
+        caller can write them to the local database from a single thread.
+
+        Args:
+            func: Function taking one item and returning its query result
+            items: Items to query
+
+        Returns:
+            List of results, one per item
+        """
+        if self.workers <= 1 or len(items) <= 1:
+            return [func(item) for item in items]
+        with ThreadPoolExecutor(max_workers=min(self.workers, len(items))) as executor:
+            return list(executor.map(func, items))
+
+    def _fetch_columns(self, table_name: str) -> list[dict[str, Any]]:
+        """Query the TAP server for the columns of one table."""
+        escaped_table = self._escape_adql_string(table_name)
+        return self.query_tap_schema_table("columns", f"table_name = '{escaped_table}'")
+
+    def _fetch_key_columns(self, key_id) -> list[dict[str, Any]]:
+        """Query the TAP server for the columns of one foreign key."""
+        escaped_key_id = self._escape_adql_string(str(key_id))
+        return self.query_tap_schema_table("key_columns", f"key_id = '{escaped_key_id}'")
+
     def import_schema(self, schema_name: str):
         """
         Import a specific schema from the external TAP server.
@@ -189,20 +224,25 @@ class TAPSchemaImporter:
 
         logger.info(f"Found {len(tables)} tables")
 
+        # Insert all tables into local database in one transaction
+        self.db.insert_tables(
+            [
+                {
+                    "schema_name": table_data.get("schema_name"),
+                    "table_name": table_data.get("table_name"),
+                    "table_type": table_data.get("table_type", "table"),
+                    "description": table_data.get("description"),
+                    "utype": table_data.get("utype"),
+                }
+                for table_data in tables
+            ]
+        )
+
         table_names = []
         for table_data in tables:
             schema = table_data.get("schema_name")
             table = table_data.get("table_name")
 
-            # Insert table into local database
-            self.db.insert_table(
-                schema_name=schema,
-                table_name=table,
-                table_type=table_data.get("table_type", "table"),
-                description=table_data.get("description"),
-                utype=table_data.get("utype"),
-            )
-
             # Build fully qualified name
             full_table_name = f"{schema}.{table}" if schema else table
             table_names.append(full_table_name)
@@ -221,48 +261,34 @@ class TAPSchemaImporter:
         """
         logger.info(f"Importing columns for {len(table_names)} tables")
 
-        total_columns = 0
-        for table_name in table_names:
-            # Query for columns in this table
-            escaped_table = self._escape_adql_string(table_name)
-            columns = self.query_tap_schema_table("columns", f"table_name = '{escaped_table}'")
+        # Query for the columns of all tables concurrently, then insert them
+        # from this thread
+        columns_per_table = self._query_all(self._fetch_columns, table_names)
 
+        total_columns = 0
+        for table_name, columns in zip(table_names, columns_per_table, strict=True):
             if not columns:
                 logger.warning(f"No columns found for table '{table_name}'")
                 continue
 
             logger.info(f"  Importing {len(columns)} columns for {table_name}")
 
+            # Group the columns by the table name to store them under, then
+            # insert each group with a single executemany() and commit.
+            # Use local_table_name if provided and importing a single table,
+            # otherwise use original table name.
+            columns_by_table = {}
             for col_data in columns:
-                # Map column metadata to database fields
-                kwargs = {}
-                for field in [
-                    "description",
-                    "unit",
-                    "ucd",
-                    "utype",
-                    "datatype",
-                    "size",
-                    "principal",
-                    "indexed",
-                    "std",
-                ]:
-                    value = col_data.get(field)
-                    if value is not None:
-                        kwargs[field] = value
-
-                # Use local_table_name if provided and importing a single table,
-                # otherwise use original table name
                 stored_table_name = (
                     local_table_name
                     if local_table_name and len(table_names) == 1
                     else col_data.get("table_name")
                 )
+                columns_by_table.setdefault(stored_table_name, []).append(col_data)
 
-                self.db.insert_column(
-                    table_name=stored_table_name, column_name=col_data.get("column_name"), **kwargs
-                )
-                total_columns += 1
+            for stored_table_name, table_columns in columns_by_table.items():
+                self.db.insert_columns(stored_table_name, table_columns)
+            total_columns += len(columns)
 
             logger.debug(f"    ✓ Imported {len(columns)} columns")
 
@@ -296,29 +322,16 @@ class TAPSchemaImporter:
 
             logger.info(f"Found {len(relevant_keys)} foreign keys")
 
-            for key_data in relevant_keys:
-                self.db.insert_key(
-                    key_id=key_data.get("key_id"),
-                    from_table=key_data.get("from_table"),
-                    target_table=key_data.get("target_table"),
-                    description=key_data.get("description"),
-                    utype=key_data.get("utype"),
-                )
+            # Query for the columns of all keys concurrently
+            key_ids = [k.get("key_id") for k in relevant_keys if k.get("key_id") is not None]
+            all_key_columns = [
+                key_column
+                for key_columns in self._query_all(self._fetch_key_columns, key_ids)
+                for key_column in key_columns
+            ]
 
-                # Import key columns
-                key_id = key_data.get("key_id")
-                if key_id is not None:
-                    escaped_key_id = self._escape_adql_string(str(key_id))
-                    key_columns = self.query_tap_schema_table("key_columns", f"key_id = '{escaped_key_id}'")
-                else:
-                    key_columns = []
-
-                for kc_data in key_columns:
-                    self.db.insert_key_column(
-                        key_id=kc_data.get("key_id"),
-                        from_column=kc_data.get("from_column"),
-                        target_column=kc_data.get("target_column"),
-                    )
+            # Insert the keys and their columns in one transaction
+            self.db.insert_keys(relevant_keys, all_key_columns)
 
             logger.info(f"✓ Imported {len(relevant_keys)} foreign keys")
 
@@ -496,6 +509,13 @@ Examples:
 
     parser.add_argument("--no-keys", action="store_true", help="Skip importing foreign key relationships")
 
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=8,
+        help="Maximum number of concurrent queries to the TAP server (default: 8)",
+    )
+
     parser.add_argument("--verbose", "-v", action="store_true", help="Enable verbose debug logging")
 
     args = parser.parse_args()
@@ -523,7 +543,7 @@ Examples:
     print("=" * 70)
 
     try:
-        with TAPSchemaImporter(args.url, args.db_path) as importer:
+        with TAPSchemaImporter(args.url, args.db_path, workers=args.workers) as importer:
             if args.schema:
                 success = importer.import_schema_metadata(args.schema, include_keys=not args.no_keys)
                 query_hint = f"SELECT * FROM tables WHERE schema_name = '{args.schema}';"
@@ -10,11 +10,42 @@ key columns. It uses Python's built-in sqlite3 module for maximum portability.
 Reference: https://www.ivoa.net/documents/TAP/20181024/PR-TAP-1.1-20181024.html
 """
 
+import contextlib
+import functools
 import re
 import sqlite3
 import threading
 from typing import Any
 
+# Optional metadata fields of a TAP_SCHEMA.columns record
+COLUMN_FIELDS = (
+    "description",
+    "unit",
+    "ucd",
+    "utype",
+    "datatype",
+    "size",
+    "principal",
+    "indexed",
+    "std",
+)
+
+# Number of prepared statements the shared connection keeps (sqlite3's default
+# is 128).  The server issues a few distinct SELECTs, per table and per set of
+# wanted columns, so keep more of them prepared rather than re-parsing the SQL.
+CACHED_STATEMENTS = 256
+
+
+def _locked(method):
+    """Run a TAPSchemaDatabase method that uses the shared connection under its lock."""
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._lock:
+            return method(self, *args, **kwargs)
+
+    return wrapper
+
 
 class TAPSchemaDatabase:
     """
@@ -30,34 +61,61 @@ class TAPSchemaDatabase:
     SQLite tools (CLI: sqlite3, GUI: DB Browser for SQLite, etc.)
     """
 
-    def __init__(self, db_path: str = "tap_schema.db", qualified=""):
+    def __init__(self, db_path: str = "tap_schema.db", qualified="", pragmas: dict[str, Any] = None):
         """
         Initialize the TAP schema database connection.
 
         Args:
             db_path: Path to the SQLite database file. If the file doesn't exist,
                     it will be created when initialize_schema() is called.
+                    SQLite "file:" URIs are accepted too, e.g.
+                    "file:/tap_schema?vfs=memdb" for an in-memory database
+                    that, unlike ":memory:", can also be attached under the
+                    qualified name.  It lives until close().
             qualified: attach to this database qualified as this identifier,
                     if non-blank.
+            pragmas: Optional SQLite PRAGMA settings (name -> value) applied to
+                    every new connection, e.g. {"journal_mode": "WAL"}.
         """
         self.db_path = db_path
         self.qualified = qualified
-        # Use thread-local storage for connections to ensure thread safety
-        self._local = threading.local()
+        self.pragmas = dict(pragmas or {})
+        # One connection is shared by all threads.  Every read and write (and
+        # opening or closing the connection) holds this lock: SQLite serializes
+        # statements on a connection anyway, and the lock also keeps other
+        # threads from reading another thread's uncommitted bulk() writes, or
+        # from closing the connection in the middle of a query.
+        self._connection = None
+        self._lock = threading.RLock()
+        # Nesting depth of `with` blocks, and whether the outermost one opened
+        # the connection (and so should close it again)
+        self._context_depth = 0
+        self._close_on_exit = False
+        # Nesting depth of bulk() blocks; while positive, writes are not
+        # committed individually
+        self._bulk_depth = 0
 
     @property
     def connection(self):
-        """Get the connection for the current thread."""
-        if not hasattr(self._local, "connection") or self._local.connection is None:
-            return None
-        return self._local.connection
+        """Get the shared connection, or None if it is not open."""
+        return self._connection
 
     def connect(self):
-        """Open a connection to the database for the current thread."""
-        if self.connection is None:
-            conn = sqlite3.connect(self.db_path)
+        """Open the connection to the database, shared by all threads, if it is not open yet."""
+        if self._connection is not None:
+            return
+        with self._lock:
+            if self._connection is not None:
+                return
+            conn = sqlite3.connect(
+                self.db_path,
+                check_same_thread=False,
+                cached_statements=CACHED_STATEMENTS,
+                uri=self.db_path.startswith("file:"),
+            )
             # Enable foreign key constraints
             conn.execute("PRAGMA foreign_keys = ON")
+            self._apply_pragmas(conn)
             if self.qualified:
                 # Attach as TAP_SCHEMA for conformance with protocol
                 # NOTE: while sqlite3 will *permit* us to interpolate
@@ -70,23 +128,99 @@ class TAPSchemaDatabase:
                 conn.execute(f"ATTACH DATABASE ? as {self.qualified};", (self.db_path,))
             # Use Row factory for dictionary-like access
             conn.row_factory = sqlite3.Row
-            self._local.connection = conn
+            self._connection = conn
+
+    def _apply_pragmas(self, conn):
+        """Apply the configured PRAGMA settings to a new connection."""
+        for name, value in self.pragmas.items():
+            # PRAGMA arguments cannot be bound as parameters, so validate them
+            # before interpolating.
+            if not re.match(r"^[A-Za-z_]\w*$", name):
+                raise ValueError(f"PRAGMA name '{name}' is not an ID")
+            if not isinstance(value, int) and not re.match(r"^[A-Za-z_]\w*$", str(value)):
+                raise ValueError(f"PRAGMA value '{value}' for '{name}' is not an integer or keyword")
+            # Tuning is best-effort; e.g. WAL mode cannot be enabled on a
+            # read-only database file, which is still perfectly readable.
+            with contextlib.suppress(sqlite3.DatabaseError):
+                conn.execute(f"PRAGMA {name} = {value}")
 
     def close(self):
-        """Close the database connection for the current thread."""
-        if self.connection:
-            self.connection.close()
-            self._local.connection = None
+        """
+        Close the shared database connection.
+
+        The connection is shared by all threads, so this is meant for shutdown:
+        it waits for any query or write in progress, and a later call from any
+        thread opens a new connection (to an empty database, for memdb URIs).
+
+        Raises:
+            RuntimeError: if called inside a bulk() block
+        """
+        with self._lock:
+            if self._bulk_depth:
+                raise RuntimeError("Cannot close the database inside a bulk() block")
+            if self._connection:
+                self._connection.close()
+                self._connection = None
 
     def __enter__(self):
         """Context manager entry."""
-        self.connect()
+        with self._lock:
+            if self._context_depth == 0:
+                self._close_on_exit = self._connection is None
+            self._context_depth += 1
+            self.connect()
         return self
 
     def __exit__(self, exc_type, exc_val, exc_tb):
-        """Context manager exit."""
-        self.close()
+        """Context manager exit; closes the connection if the outermost `with` opened it."""
+        with self._lock:
+            self._context_depth -= 1
+            if self._context_depth == 0 and self._close_on_exit:
+                self.close()
+
+    @contextlib.contextmanager
+    def bulk(self):
+        """
+        Group several writes into a single transaction.
+
+        Inside the block, insert_*() and other writes do not commit; everything
+        is committed when the outermost block exits, or rolled back if it raises.
+        The block holds the lock, so other threads' reads and writes wait for it.
 
+        Example:
+            with db.bulk():
+                db.insert_schema("public")
+                db.insert_table("public", "ztf_dr14")
+        """
+        with self._lock:
+            self.connect()
+            self._bulk_depth += 1
+            try:
+                yield self
+            except BaseException:
+                self._bulk_depth -= 1
+                if self._bulk_depth == 0:
+                    self.connection.rollback()
+                raise
+            self._bulk_depth -= 1
+            if self._bulk_depth == 0:
+                self.connection.commit()
+
+    def _commit(self):
+        """Commit the current write, unless it is part of a bulk() block."""
+        if not self._bulk_depth:
+            self.connection.commit()
+
+    @contextlib.contextmanager
+    def _transaction(self):
+        """Commit the writes of the block together, or roll them back on error, unless in bulk()."""
+        if self._bulk_depth:
+            yield
+            return
+        with self.connection:
+            yield
+
+    @_locked
     def initialize_schema(self):
         """
         Create the TAP_SCHEMA tables in the database.
@@ -218,8 +352,9 @@ class TAPSchemaDatabase:
         """
         )
 
-        self.connection.commit()
+        self._commit()
 
+    @_locked
     def insert_schema(self, schema_name: str, description: str = None, utype: str = None):
         """
         Insert a schema record.
@@ -235,8 +370,9 @@ class TAPSchemaDatabase:
             "INSERT OR REPLACE INTO schemas (schema_name, description, utype) VALUES (?, ?, ?)",
             (schema_name, description, utype),
         )
-        self.connection.commit()
+        self._commit()
 
+    @_locked
     def insert_table(
         self,
         schema_name: str,
@@ -263,8 +399,9 @@ class TAPSchemaDatabase:
                VALUES (?, ?, ?, ?, ?)""",
             (schema_name, table_name, table_type, description, utype),
         )
-        self.connection.commit()
+        self._commit()
 
+    @_locked
     def insert_column(self, table_name: str, column_name: str, **kwargs):
         """
         Insert a column record.
@@ -282,19 +419,7 @@ class TAPSchemaDatabase:
         columns = ["table_name", "column_name"]
         values = [table_name, column_name]
 
-        valid_fields = [
-            "description",
-            "unit",
-            "ucd",
-            "utype",
-            "datatype",
-            "size",
-            "principal",
-            "indexed",
-            "std",
-        ]
-
-        for field in valid_fields:
+        for field in COLUMN_FIELDS:
             if field in kwargs:
                 columns.append(field)
                 values.append(kwargs[field])
@@ -303,8 +428,63 @@ class TAPSchemaDatabase:
         column_names = ", ".join(columns)
 
         cursor.execute(f"INSERT OR REPLACE INTO columns ({column_names}) VALUES ({placeholders})", values)
-        self.connection.commit()
+        self._commit()
+
+    @_locked
+    def insert_tables(self, tables: list[dict[str, Any]]):
+        """
+        Insert several table records in a single transaction.
+
+        Args:
+            tables: List of dictionaries with keys schema_name and table_name, and
+                   optionally table_type (default 'table'), description and utype
+        """
+        self.connect()
+        rows = [
+            (
+                table["schema_name"],
+                table["table_name"],
+                table.get("table_type", "table"),
+                table.get("description"),
+                table.get("utype"),
+            )
+            for table in tables
+        ]
+        with self._transaction():
+            self.connection.executemany(
+                """INSERT OR REPLACE INTO tables
+                   (schema_name, table_name, table_type, description, utype)
+                   VALUES (?, ?, ?, ?, ?)""",
+                rows,
+            )
+
+    @_locked
+    def insert_columns(self, table_name: str, columns: list[dict[str, Any]]):
+        """
+        Insert several column records for one table in a single transaction.
 
+        This is equivalent to calling insert_column() for each column, but uses
+        one executemany() and one commit, which matters for tables with
+        thousands of columns.
+
+        Args:
+            table_name: Fully qualified table name (schema.table)
+            columns: List of dictionaries with a column_name key and, optionally,
+                    any of the column metadata fields accepted by insert_column()
+        """
+        self.connect()
+        column_names = ", ".join(["table_name", "column_name", *COLUMN_FIELDS])
+        placeholders = ", ".join(["?"] * (len(COLUMN_FIELDS) + 2))
+        rows = [
+            (table_name, column["column_name"], *(column.get(field) for field in COLUMN_FIELDS))
+            for column in columns
+        ]
+        with self._transaction():
+            self.connection.executemany(
+                f"INSERT OR REPLACE INTO columns ({column_names}) VALUES ({placeholders})", rows
+            )
+
+    @_locked
     def insert_key(
         self, key_id: str, from_table: str, target_table: str, description: str = None, utype: str = None
     ):
@@ -326,8 +506,9 @@ class TAPSchemaDatabase:
                VALUES (?, ?, ?, ?, ?)""",
             (key_id, from_table, target_table, description, utype),
         )
-        self.connection.commit()
+        self._commit()
 
+    @_locked
     def insert_key_column(self, key_id: str, from_column: str, target_column: str):
         """
         Insert a key column record.
@@ -345,11 +526,42 @@ class TAPSchemaDatabase:
                VALUES (?, ?, ?)""",
             (key_id, from_column, target_column),
         )
-        self.connection.commit()
+        self._commit()
+
+    @_locked
+    def insert_keys(self, keys: list[dict[str, Any]], key_columns: list[dict[str, Any]] = ()):
+        """
+        Insert several foreign key records, and their key columns, in a single transaction.
+
+        Args:
+            keys: List of dictionaries with keys key_id, from_table and target_table,
+                 and optionally description and utype
+            key_columns: List of dictionaries with keys key_id, from_column and target_column
+        """
+        self.connect()
+        key_rows = [
+            (key["key_id"], key["from_table"], key["target_table"], key.get("description"), key.get("utype"))
+            for key in keys
+        ]
+        key_column_rows = [(kc["key_id"], kc["from_column"], kc["target_column"]) for kc in key_columns]
+        with self._transaction():
+            self.connection.executemany(
+                """INSERT OR REPLACE INTO keys
+                   (key_id, from_table, target_table, description, utype)
+                   VALUES (?, ?, ?, ?, ?)""",
+                key_rows,
+            )
+            self.connection.executemany(
+                """INSERT OR REPLACE INTO key_columns
+                   (key_id, from_column, target_column)
+                   VALUES (?, ?, ?)""",
+                key_column_rows,
+            )
 
-    def query(self, sql: str, params: tuple = None) -> list[dict[str, Any]]:
+    @_locked
+    def query(self, sql: str, params: tuple = None, as_dict: bool = False) -> list[sqlite3.Row]:
         """
-        Execute a SQL query and return results as a list of dictionaries.
+        Execute a SQL query and return the resulting rows.
 
         This method supports arbitrary SQL queries, including JOINs, WHERE clauses,
         and other SQL features supported by SQLite.
@@ -357,9 +569,12 @@ class TAPSchemaDatabase:
         Args:
             sql: SQL query string
             params: Optional tuple of parameters for parameterized queries
+            as_dict: If True, convert each row to a dictionary
 
         Returns:
-            List of dictionaries, where each dictionary represents a row
+            List of sqlite3.Row objects, which support access by column name
+            (row["schema_name"]) and by position, or a list of dictionaries if
+            as_dict is True
 
         Example:
             # Simple query
@@ -385,10 +600,38 @@ class TAPSchemaDatabase:
         else:
             cursor.execute(sql)
 
-        # Convert Row objects to dictionaries
         rows = cursor.fetchall()
-        return [dict(row) for row in rows]
+        if as_dict:
+            return [dict(row) for row in rows]
+        return rows
+
+    @_locked
+    def query_tuples(self, sql: str, params: tuple = None) -> list[tuple]:
+        """
+        Execute a SQL query and return results as plain tuples.
+
+        This avoids building a dictionary per row, for callers that know the
+        order of the selected columns and unpack rows positionally.
+
+        Args:
+            sql: SQL query string
+            params: Optional tuple of parameters for parameterized queries
+
+        Returns:
+            List of tuples, one per row, in the order of the SELECT list
+        """
+        self.connect()
+        cursor = self.connection.cursor()
+        cursor.row_factory = None
+
+        if params:
+            cursor.execute(sql, params)
+        else:
+            cursor.execute(sql)
+
+        return cursor.fetchall()
 
+    @_locked
     def query_with_columns(self, sql: str, params: tuple = None) -> tuple[list[dict[str, Any]], list[str]]:
         """
         Execute a SQL query and return results with column names.
@@ -418,6 +661,7 @@ class TAPSchemaDatabase:
 
         return data, columns
 
+    @_locked
     def clear_all_tables(self):
         """
         Delete all data from all TAP_SCHEMA tables.
@@ -434,8 +678,9 @@ class TAPSchemaDatabase:
         cursor.execute("DELETE FROM tables")
         cursor.execute("DELETE FROM schemas")
 
-        self.connection.commit()
+        self._commit()
 
+    @_locked
     def drop_all_tables(self):
         """
         Drop all TAP_SCHEMA tables from the database.
@@ -451,8 +696,9 @@ class TAPSchemaDatabase:
         cursor.execute("DROP TABLE IF EXISTS tables")
         cursor.execute("DROP TABLE IF EXISTS schemas")
 
-        self.connection.commit()
+        self._commit()
 
+    @_locked
     def get_table_count(self, table_name: str) -> int:
         """
         Get the number of rows in a table.
@@ -10,29 +10,77 @@ This prototype returns sample data instead of executing actual queries against a
 
 import argparse
 import datetime
+import functools
+import io
+import itertools
 import logging
+import operator
 import os
 import re
+import string
+import threading
+import types
 import xml.etree.ElementTree as ET  # noqa: N817
-from xml.dom import minidom
+from xml.sax.saxutils import escape
 
 import lsdb
+import numpy as np
+import pandas as pd
 from flask import Flask, Response, request
 
-from .adql_to_lsdb import parse_adql_entities
+from .adql_to_lsdb import parse_adql_entities, warm_up_parser
 
 # Import TAP schema database module
 from .tap_schema_db import TAPSchemaDatabase
 
+# Root of the HATS catalogs served by this instance.  Use one of several
+# catalog prefixes, depending on how this service is deployed:
+#
+# 1. If we take it right from public HTTP:
+#    CATALOG_PREFIX = "https://data.lsdb.io/hats"
+# 2. If we use the LSDB backend that does server-side filtering,
+#    to save bandwidth:
+#    CATALOG_PREFIX = "http://epyc.astro.washington.edu:43210/hats"
+# 3. If we're running on epyc, this is the direct path to the data,
+#    for best performance:
+#    CATALOG_PREFIX = "/var/www/data.lsdb.io/html/hats"
+CATALOG_PREFIX = "/var/www/data.lsdb.io/html/hats"
+
+# Accepted values of the LANG parameter, e.g. "ADQL" or "ADQL-2.0"
+_LANG_RE = re.compile(r"^adql(-\d+\(\.\d+\)?)?", re.IGNORECASE)
+
+# Queries referencing a TAP_SCHEMA table, e.g. "SELECT * FROM TAP_SCHEMA.tables"
+_TAP_SCHEMA_RE = re.compile(r"tap_schema\.", re.IGNORECASE)
+
+# Accepted values of the FORMAT parameter (lowercased)
+_SUPPORTED_FORMATS = frozenset({"votable", "votable/td"})
+
 app = Flask(__name__)
 
 
 def create_app():
-    """Return the Flask application for use with WSGI servers such as gunicorn."""
+    """
+    Return the Flask application for use with WSGI servers such as gunicorn.
+
+    The application and its routes are built once, when this module is
+    imported; every call returns that same instance rather than a new app.
+    The first call also warms up the ADQL parser, so that the first queries
+    are not slowed down by it.  With gunicorn, use ``create_app()`` as the
+    application together with ``--preload``: the warm-up then happens once in
+    the master process, and the forked workers share the warmed cache.
+    """
+    _warm_up_parser_once()
     return app
 
 
+@functools.cache
+def _warm_up_parser_once():
+    """Build the ADQL parser's prediction cache, once per process."""
+    warm_up_parser()
+
+
 # Default WSGI callable name expected by gunicorn when no object is specified.
+# Unlike create_app(), it does not warm up the ADQL parser.
 application = app
 
 
@@ -40,6 +88,9 @@ application = app
 @app.before_request
 def log_request_info():
     """Help with debugging exactly what the client sent."""
+    # request.url is rebuilt on every access, so skip it unless it is logged
+    if not app.logger.isEnabledFor(logging.DEBUG):
+        return
     app.logger.debug("Request URL: %s", request.url)
     app.logger.debug("Request Method: %s", request.method)
     app.logger.debug("Request Headers: %s", request.headers)
@@ -48,14 +99,23 @@ def log_request_info():
 # Initialize TAP schema database
 # The database will be created if it doesn't exist when the server starts
 TAP_SCHEMA_DB_PATH = os.path.join(os.path.dirname(__file__), "tap_schema.db")
-tap_schema_db = TAPSchemaDatabase(TAP_SCHEMA_DB_PATH, qualified="tap_schema")
+
+# The server only reads TAP_SCHEMA, so the connection is made read-only and tuned
+# for reads.  The journal mode is left alone: switching the file to WAL would
+# persist, and create -wal/-shm files next to it, possibly in a read-only install.
+# The connection is shared by all request threads and stays open for the life of the process.
+TAP_SCHEMA_PRAGMAS = {
+    "query_only": "ON",
+    "temp_store": "MEMORY",
+    "mmap_size": 268435456,
+    "cache_size": -65536,
+}
+tap_schema_db = TAPSchemaDatabase(TAP_SCHEMA_DB_PATH, qualified="tap_schema", pragmas=TAP_SCHEMA_PRAGMAS)
 
 
 def is_tap_schema_query(query_str: str):
     """Check if the query is for a TAP_SCHEMA table."""
-    if not query_str:
-        return False
-    return "tap_schema." in query_str.lower()
+    return bool(query_str) and _TAP_SCHEMA_RE.search(query_str) is not None
 
 
 def query_tap_schema(query_str: str):
@@ -74,74 +134,147 @@ def query_tap_schema(query_str: str):
         return [], []
 
 
-def get_column_metadata(table_name: str):
+def get_column_metadata(table_name: str, wanted_cols=None):
     """
     Get column metadata from tap_schema.db for a given table.
 
+    Results are cached per table name and set of wanted columns, since the
+    TAP_SCHEMA metadata does not change while the server is running.  Call
+    ``get_column_metadata.cache_clear()`` after re-importing tap_schema.db.
+    The cached mappings are shared by all callers, so they are read-only.
+
     Args:
         table_name: The table name to fetch metadata for (e.g., 'ztf_dr14' or 'public.ztf_dr14')
+        wanted_cols: Optional list of column names to fetch metadata for; by default,
+                     metadata for all of the table's columns is returned
 
     Returns:
-        Dictionary mapping column names to metadata dicts with keys: datatype, unit, ucd, description
+        Read-only mapping of column names to read-only metadata mappings with keys:
+        datatype, unit, ucd, description
     """
     if not table_name:
         return {}
+    if wanted_cols is not None:
+        if not wanted_cols:
+            return {}
+        wanted_cols = tuple(sorted(set(wanted_cols)))
 
-    # Try the table name as-is first
-    query = "SELECT column_name, datatype, unit, ucd, description FROM columns WHERE table_name = ?"
     try:
-        tap_schema_db.connect()
-        results = tap_schema_db.query(query, (table_name,))
-
-        # If no results and table_name doesn't have schema prefix, try with 'public.' prefix
-        if not results and "." not in table_name:
-            results = tap_schema_db.query(query, (f"public.{table_name}",))
-
-        # Build metadata dictionary
-        metadata = {}
-        for row in results:
-            col_name = row["column_name"]
-            metadata[col_name] = {
-                "datatype": row.get("datatype", "char"),
-                "unit": row.get("unit", ""),
-                "ucd": row.get("ucd", ""),
-                "description": row.get("description", ""),
-            }
-
-        return metadata
+        return _get_column_metadata_cached(table_name, wanted_cols)
     except Exception as e:
         app.logger.error("Error fetching column metadata for table %s: %s", table_name, str(e), exc_info=True)
         return {}
 
 
+# Largest number of column names bound in one "IN (...)" list, well below
+# SQLite's limit on the number of variables in a statement
+_MAX_IN_PARAMS = 500
+
+
+@functools.lru_cache(maxsize=256)
+def _get_column_metadata_cached(table_name: str, wanted_cols: tuple = None):
+    """Look up column metadata for a table; failures raise, so they are never cached."""
+    # If the table is not known under its name and that name doesn't have a
+    # schema prefix, try with the 'public.' prefix.  This depends on whether
+    # the table exists, not on whether any of the wanted columns were found.
+    # The fallback shares its cache entry with direct lookups of 'public.<table>'.
+    if "." not in table_name and not tap_schema_db.query_tuples(
+        "SELECT 1 FROM columns WHERE table_name = ? LIMIT 1", (table_name,)
+    ):
+        return _get_column_metadata_cached(f"public.{table_name}", wanted_cols)
+
+    query = "SELECT column_name, datatype, unit, ucd, description FROM columns WHERE table_name = ?"
+    if not wanted_cols:
+        results = tap_schema_db.query_tuples(query, (table_name,))
+    else:
+        # Only fetch the rows for the columns that are actually returned, a
+        # bounded number of names at a time
+        results = []
+        for start in range(0, len(wanted_cols), _MAX_IN_PARAMS):
+            batch = wanted_cols[start : start + _MAX_IN_PARAMS]
+            results += tap_schema_db.query_tuples(
+                f"{query} AND column_name IN ({','.join('?' * len(batch))})", (table_name, *batch)
+            )
+
+    # Build metadata dictionary; it is returned from the cache to every caller,
+    # so expose it read-only
+    metadata = {}
+    for col_name, datatype, unit, ucd, description in results:
+        metadata[col_name] = types.MappingProxyType(
+            {
+                "datatype": datatype,
+                "unit": unit,
+                "ucd": ucd,
+                "description": description,
+            }
+        )
+
+    return types.MappingProxyType(metadata)
+
+
+get_column_metadata.cache_clear = _get_column_metadata_cached.cache_clear
+
+
 def format_xml_with_indentation(element):
     """
     Format an XML element with proper indentation.
 
+    The element is indented in place.
+
     Args:
         element: An ElementTree Element to format
 
     Returns:
         String containing formatted XML with proper indentation
     """
-    # Convert to string
-    xml_str = ET.tostring(element, encoding="unicode", method="xml")
+    # Indent in place; this avoids re-parsing the serialized XML into a second DOM
+    ET.indent(element, space="  ")
+    return '<?xml version="1.0" encoding="UTF-8"?>\n' + ET.tostring(element, encoding="unicode")
+
+
+# Entities that ElementTree escapes in attribute values, besides &, < and >
+_ATTR_ENTITIES = {'"': "&quot;", "\n": "&#10;", "\r": "&#13;", "\t": "&#09;"}
+
 
-    # Parse and format with minidom for indentation
-    dom = minidom.parseString(xml_str)
-    pretty_xml = dom.toprettyxml(indent="  ", encoding=None)
+def _escape_attr(value):
+    """Escape a string for substitution into an XML attribute value."""
+    return escape(str(value), _ATTR_ENTITIES)
 
-    # Remove the extra XML declaration that minidom adds (we'll add our own)
-    lines = pretty_xml.split("\n")
-    if lines[0].startswith("<?xml"):
-        lines = lines[1:]
 
-    # Remove empty lines at the end
-    while lines and not lines[-1].strip():
-        lines.pop()
+def _empty_element(tag, attrs):
+    """Serialize an empty XML element, e.g. ``<INFO name="QUERY_STATUS" value="OK" />``."""
+    return "<" + tag + "".join(f' {name}="{_escape_attr(value)}"' for name, value in attrs.items()) + " />"
 
-    # Add XML declaration and return
-    return '<?xml version="1.0" encoding="UTF-8"?>\n' + "\n".join(lines)
+
+# Opening and closing tags shared by every VOTable document.  The documents are
+# written as text, indented the same way as format_xml_with_indentation().
+_VOTABLE_OPEN = (
+    '<?xml version="1.0" encoding="UTF-8"?>\n'
+    '<VOTABLE version="1.4" xmlns="http://www.ivoa.net/xml/VOTable/v1.4" '
+    'xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance">\n'
+    '  <RESOURCE type="results">\n'
+)
+_VOTABLE_CLOSE = "  </RESOURCE>\n</VOTABLE>\n"
+_TABLE_CLOSE = "        </TABLEDATA>\n      </DATA>\n    </TABLE>\n"
+_TABLEDATA_CLOSE = _TABLE_CLOSE + _VOTABLE_CLOSE
+
+
+# Hard-coded FIELD metadata for well-known astronomical columns that have no
+# entry in tap_schema.db, keyed by lowercased column name
+_RA_META = {"unit": "deg", "ucd": "pos.eq.ra;meta.main"}
+_DEC_META = {"unit": "deg", "ucd": "pos.eq.dec;meta.main"}
+_MAG_META = {"unit": "mag", "ucd": "phot.mag"}
+_FALLBACK_META = {
+    "ra": _RA_META,
+    "ra_deg": _RA_META,
+    "dec": _DEC_META,
+    "dec_deg": _DEC_META,
+    "mag": _MAG_META,
+    "magnitude": _MAG_META,
+}
+
+# Number of TABLEDATA rows written per chunk of a streamed VOTable
+VOTABLE_ROWS_PER_CHUNK = 1000
 
 
 def create_votable_response(data, columns, query_info, column_metadata=None):
@@ -149,7 +282,7 @@ def create_votable_response(data, columns, query_info, column_metadata=None):
     Create a VOTable XML response.
 
     Args:
-        data: List of dictionaries containing row data
+        data: pandas DataFrame, or list of dictionaries containing row data
         columns: List of column names
         query_info: Dictionary with query metadata
         column_metadata: Optional dictionary mapping column names to metadata dicts
@@ -158,32 +291,47 @@ def create_votable_response(data, columns, query_info, column_metadata=None):
     Returns:
         String containing VOTable XML
     """
-    # Create VOTable root element
-    votable = ET.Element(
-        "VOTABLE",
-        {
-            "version": "1.4",
-            "xmlns": "http://www.ivoa.net/xml/VOTable/v1.4",
-            "xmlns:xsi": "http://www.w3.org/2001/XMLSchema-instance",
-        },
-    )
+    return "".join(stream_votable(data, columns, query_info, column_metadata))
 
-    # Add RESOURCE element
-    resource = ET.SubElement(votable, "RESOURCE", {"type": "results"})
 
-    # Add INFO elements for query metadata
-    ET.SubElement(resource, "INFO", {"name": "QUERY_STATUS", "value": "OK"})
+def stream_votable(data, columns, query_info, column_metadata=None):
+    """
+    Generate a VOTable XML response in chunks.
+
+    The header is yielded first, followed by the TABLEDATA rows in chunks of
+    VOTABLE_ROWS_PER_CHUNK and then the closing tags, so a response can be sent
+    without holding the whole document in memory.
 
-    ET.SubElement(resource, "INFO", {"name": "QUERY", "value": query_info.get("query", "")})
+    If a row cannot be written, the rows written so far are kept and the
+    document is closed with a trailing QUERY_STATUS of ERROR, since the
+    response status has already been sent by then.
 
-    ET.SubElement(
-        resource, "INFO", {"name": "TIMESTAMP", "value": datetime.datetime.now(datetime.UTC).isoformat()}
+    Args:
+        data: pandas DataFrame, or list of dictionaries containing row data
+        columns: List of column names
+        query_info: Dictionary with query metadata
+        column_metadata: Optional dictionary mapping column names to metadata dicts
+                        (with keys: datatype, unit, ucd, description)
+
+    Yields:
+        Strings which, concatenated, form the VOTable XML
+    """
+    head = io.StringIO()
+    head.write(_VOTABLE_OPEN)
+
+    # Add INFO elements for query metadata
+    head.write("    " + _empty_element("INFO", {"name": "QUERY_STATUS", "value": "OK"}) + "\n")
+    head.write(
+        "    " + _empty_element("INFO", {"name": "QUERY", "value": query_info.get("query", "")}) + "\n"
     )
+    timestamp = datetime.datetime.now(datetime.UTC).isoformat()
+    head.write("    " + _empty_element("INFO", {"name": "TIMESTAMP", "value": timestamp}) + "\n")
 
     # Add TABLE element
-    table = ET.SubElement(resource, "TABLE", {"name": query_info.get("table", "results")})
+    head.write(f'    <TABLE name="{_escape_attr(query_info.get("table", "results"))}">\n')
 
     # Add FIELD elements for each column
+    missing_cols = []
     for col in columns:
         field_attrs = {
             "name": col,
@@ -201,41 +349,48 @@ def create_votable_response(data, columns, query_info, column_metadata=None):
             if meta.get("ucd"):
                 field_attrs["ucd"] = meta["ucd"]
         else:
-            # Warn about missing metadata
-            table_name = query_info.get("table", "unknown")
-            app.logger.warning(
-                "Missing metadata for column '%s' in table '%s'. Using fallback values.",
-                col,
-                table_name,
-            )
+            missing_cols.append(col)
 
             # Fallback: Handle special astronomical columns with hard-coded values
-            if col.lower() in ["ra", "ra_deg"]:
-                field_attrs["unit"] = "deg"
-                field_attrs["ucd"] = "pos.eq.ra;meta.main"
-            elif col.lower() in ["dec", "dec_deg"]:
-                field_attrs["unit"] = "deg"
-                field_attrs["ucd"] = "pos.eq.dec;meta.main"
-            elif col.lower() in ["mag", "magnitude"]:
-                field_attrs["unit"] = "mag"
-                field_attrs["ucd"] = "phot.mag"
-
-        ET.SubElement(table, "FIELD", field_attrs)
-
-    # Add DATA element with TABLEDATA
-    data_elem = ET.SubElement(table, "DATA")
-    tabledata = ET.SubElement(data_elem, "TABLEDATA")
-
-    # Add rows
-    for row_data in data:
-        tr = ET.SubElement(tabledata, "TR")
-        for col in columns:
-            td = ET.SubElement(tr, "TD")
-            value = row_data.get(col, "")
-            td.text = str(value) if value is not None else ""
-
-    # Format and return the XML with proper indentation
-    return format_xml_with_indentation(votable)
+            fallback = _FALLBACK_META.get(col.lower())
+            if fallback:
+                field_attrs.update(fallback)
+
+        head.write("      " + _empty_element("FIELD", field_attrs) + "\n")
+
+    # Warn about missing metadata once per response rather than once per column
+    if missing_cols and app.logger.isEnabledFor(logging.WARNING):
+        app.logger.warning(
+            "Missing metadata for columns %s in table '%s'. Using fallback values.",
+            missing_cols,
+            query_info.get("table", "unknown"),
+        )
+
+    head.write("      <DATA>\n        <TABLEDATA>\n")
+    yield head.getvalue()
+
+    # Every row has the same shape, so build its template once per response
+    row_template = "          <TR>" + "<TD>%s</TD>" * len(columns) + "</TR>\n"
+
+    try:
+        rows = _iter_row_values(data, columns)
+        while chunk := list(itertools.islice(rows, VOTABLE_ROWS_PER_CHUNK)):
+            yield "".join(
+                row_template % tuple("" if value is None else escape(str(value)) for value in values)
+                for values in chunk
+            )
+    except Exception as e:
+        app.logger.error(
+            "Error writing VOTable rows: %s. Query: %s", str(e), query_info.get("query", ""), exc_info=True
+        )
+        infos = [
+            {"name": "QUERY_STATUS", "value": "ERROR"},
+            {"name": "ERROR", "value": f"Error writing query results: {str(e)}"},
+        ]
+        yield _TABLE_CLOSE + "".join("    " + _empty_element("INFO", attrs) + "\n" for attrs in infos)
+        yield _VOTABLE_CLOSE
+        return
+    yield _TABLEDATA_CLOSE
 
 
 def create_error_votable(error_message, query=""):
@@ -249,44 +404,91 @@ def create_error_votable(error_message, query=""):
     Returns:
         String containing VOTable XML with error
     """
-    votable = ET.Element("VOTABLE", {"version": "1.4", "xmlns": "http://www.ivoa.net/xml/VOTable/v1.4"})
+    infos = [{"name": "QUERY_STATUS", "value": "ERROR"}, {"name": "ERROR", "value": error_message}]
+    if query:
+        infos.append({"name": "QUERY", "value": query})
 
-    resource = ET.SubElement(votable, "RESOURCE", {"type": "results"})
+    lines = "".join("    " + _empty_element("INFO", attrs) + "\n" for attrs in infos)
+    return _VOTABLE_OPEN + lines + _VOTABLE_CLOSE
 
-    ET.SubElement(resource, "INFO", {"name": "QUERY_STATUS", "value": "ERROR"})
 
-    ET.SubElement(resource, "INFO", {"name": "ERROR", "value": error_message})
+# Error documents for malformed requests, rendered once at import time.  The
+# templates are filled in with _escape_attr()-ed values, so they produce the
+# same XML as create_error_votable() without formatting it per request.
+_ERR_MISSING_QUERY_XML = create_error_votable("Missing required parameter: QUERY")
+_ERR_INVALID_REQUEST_XML_TEMPLATE = string.Template(
+    create_error_votable("Invalid REQUEST parameter: $value. Must be 'doQuery'.")
+)
+_ERR_UNSUPPORTED_LANG_XML_TEMPLATE = string.Template(
+    create_error_votable("Unsupported query language: $value. Only ADQL is supported.")
+)
+_ERR_UNSUPPORTED_FORMAT_XML_TEMPLATE = string.Template(
+    create_error_votable("Unsupported format: $value", "$query")
+)
+
+
+def _iter_row_values(data, columns):
+    """
+    Iterate over the rows of VOTable data.
+
+    Args:
+        data: pandas DataFrame, or list of dictionaries containing row data
+        columns: List of column names
+
+    Returns:
+        Iterator yielding, for each row, an iterable of values in column order
+    """
+    if isinstance(data, pd.DataFrame):
+        # Pull each column out as an array once, instead of building a dict per row
+        return zip(*(_column_values(data[col]) for col in columns), strict=True)
+    return (tuple(row_data.get(col, "") for col in columns) for row_data in data)
 
-    if query:
-        ET.SubElement(resource, "INFO", {"name": "QUERY", "value": query})
 
-    # Format and return the XML with proper indentation
-    return format_xml_with_indentation(votable)
+def _column_values(series):
+    """
+    Get the values of a DataFrame column as an array, formatted like its pandas scalars.
+
+    Plain numeric, boolean and object columns are returned as they are.  The
+    raw values of datetime, timedelta and extension (e.g. nullable integer)
+    columns would be written differently, e.g. '2020-01-01T00:00:00.000000000',
+    so these are converted to pandas scalars such as Timestamp and NaT, the
+    same values as DataFrame.to_dict("records") gives.  Like there, pd.NA
+    becomes None, which is written as an empty cell.
+
+    Args:
+        series: pandas Series
+
+    Returns:
+        numpy array of the column's values
+    """
+    dtype = series.dtype
+    if isinstance(dtype, np.dtype) and dtype.kind not in "mM":
+        return series.to_numpy()
+    if getattr(dtype, "na_value", None) is pd.NA:
+        return series.to_numpy(dtype=object, na_value=None)
+    return series.astype(object).to_numpy()
 
 
 def dataframe_to_votable_data(df):
     """
     Convert a pandas DataFrame to VOTable data format.
 
+    The DataFrame itself is used as the row data; create_votable_response reads
+    it column by column, which is much cheaper than converting it to records.
+
     Args:
         df: pandas DataFrame
 
     Returns:
-        Tuple of (data_list, columns_list) where data_list is a list of dicts
+        Tuple of (df, columns_list)
     """
-    # Get column names
-    columns = df.columns.tolist()
-
-    # Convert DataFrame to list of dictionaries
-    data = df.to_dict("records")
+    return df, df.columns.tolist()
 
-    return data, columns
 
+# Static pages are encoded once and may be cached by clients and proxies
+STATIC_CACHE_CONTROL = "public, max-age=3600"
 
-@app.route("/")
-def index():
-    """Root endpoint with server information."""
-    html = """
+INDEX_HTML = """
     <html>
     <head><title>TAP Server Prototype</title></head>
     <body>
@@ -338,7 +540,13 @@ curl -X POST https://tap.data.lsdb.io/sync \\
     </body>
     </html>
     """
-    return html
+_INDEX_BYTES = INDEX_HTML.encode("utf-8")
+
+
+@app.route("/")
+def index():
+    """Root endpoint with server information."""
+    return Response(_INDEX_BYTES, mimetype="text/html", headers={"Cache-Control": STATIC_CACHE_CONTROL})
 
 
 @app.route("/sync", methods=["GET", "POST"])
@@ -358,26 +566,31 @@ def sync_query():
     # Validate REQUEST parameter
     request_type = params.get("REQUEST", "")
     if request_type != "doQuery":
-        error_msg = f"Invalid REQUEST parameter: {request_type}. Must be 'doQuery'."
         app.logger.warning("Invalid REQUEST parameter: '%s' (expected 'doQuery')", request_type)
-        return Response(create_error_votable(error_msg), mimetype="application/xml", status=400)
+        xml_response = _ERR_INVALID_REQUEST_XML_TEMPLATE.substitute(value=_escape_attr(request_type))
+        return Response(xml_response, mimetype="application/xml", status=400)
 
     # Validate LANG parameter
     lang = params.get("LANG", "ADQL")
-    if not re.match(r"^adql(-\d+\(\.\d+\)?)?", lang, re.IGNORECASE):
-        error_msg = f"Unsupported query language: {lang}. Only ADQL is supported."
+    if not _LANG_RE.match(lang):
         app.logger.warning("Unsupported query language requested: %s", lang)
-        return Response(create_error_votable(error_msg), mimetype="application/xml", status=400)
+        xml_response = _ERR_UNSUPPORTED_LANG_XML_TEMPLATE.substitute(value=_escape_attr(lang))
+        return Response(xml_response, mimetype="application/xml", status=400)
 
     # Get query
     query = params.get("QUERY", "")
     if not query:
-        error_msg = "Missing required parameter: QUERY"
         app.logger.warning("Request is missing the required QUERY parameter")
-        return Response(create_error_votable(error_msg), mimetype="application/xml", status=400)
+        return Response(_ERR_MISSING_QUERY_XML, mimetype="application/xml", status=400)
 
     # Get format (default to votable)
     output_format = params.get("FORMAT", "votable").lower()
+    if output_format not in _SUPPORTED_FORMATS:
+        app.logger.warning("Unsupported output format requested: %s", output_format)
+        xml_response = _ERR_UNSUPPORTED_FORMAT_XML_TEMPLATE.substitute(
+            value=_escape_attr(output_format), query=_escape_attr(query)
+        )
+        return Response(xml_response, mimetype="application/xml", status=400)
 
     try:
         # Check if this is a TAP_SCHEMA query
@@ -395,23 +608,11 @@ def sync_query():
 
             # Handle regular catalog query
             # Convert table name like 'gaiadr3.gaia' to URL format.
-            # Use one of several catalog prefixes, depending on how
-            # this service is deployed:
-            #
-            # 1. If we take it right from public HTTP:
-            #    catalog_prefix = "https://data.lsdb.io/hats"
-            # 2. If we use the LSDB backend that does server-side filtering,
-            #    to save bandwidth:
-            #    catalog_prefix = "http://epyc.astro.washington.edu:43210/hats"
-            # 3. If we're running on epyc, this is the direct path to the data,
-            #    for best performance:
-            #    catalog_prefix = "/var/www/data.lsdb.io/html/hats"
-            catalog_prefix = "/var/www/data.lsdb.io/html/hats"
             if "." in table:
                 parts = table.split(".")
-                catalog_url = f"{catalog_prefix}/{parts[0]}/{parts[1]}/"
+                catalog_url = f"{CATALOG_PREFIX}/{parts[0]}/{parts[1]}/"
             else:
-                catalog_url = f"{catalog_prefix}/{table}/"
+                catalog_url = f"{CATALOG_PREFIX}/{table}/"
 
             filters = entities["conditions"]
             search_filter = None
@@ -426,86 +627,33 @@ def sync_query():
                 # TODO: Other supported filters should be constructed here
                 # TODO: such as PolygonSearch
 
+            # Open the catalog per query, so that the column selection and the
+            # filters are pushed down into the parquet reads of its partitions
             cat = lsdb.open_catalog(
                 catalog_url,
                 columns=entities["columns"],
                 search_filter=search_filter,
-                # NOTE: these filters sort of work, but fail with string values like "VARIABLE"
-                filters=filters,
+                filters=filters or None,
             )
             result_df = cat.head(entities["limits"])
 
             # Convert DataFrame to VOTable data format
             data, result_columns = dataframe_to_votable_data(result_df)
 
-            # Extract table name from query for metadata using regex
-            # Good examples that match: "FROM ztf_dr14", "FROM gaia_dr3.gaia", "from MyTable WHERE"
-            # Bad examples that don't match (return 'results'): "FROMAGE", "FROM WHERE", "FROM LIMIT"
-            table_name = "results"
-
-            # SQL keywords that should not be considered table names
-            sql_keywords = {
-                "WHERE",
-                "SELECT",
-                "ORDER",
-                "GROUP",
-                "HAVING",
-                "LIMIT",
-                "OFFSET",
-                "UNION",
-                "INTERSECT",
-                "EXCEPT",
-                "JOIN",
-                "INNER",
-                "LEFT",
-                "RIGHT",
-                "OUTER",
-                "CROSS",
-                "ON",
-                "AS",
-                "AND",
-                "OR",
-                "NOT",
-                "IN",
-                "EXISTS",
-                "BETWEEN",
-                "LIKE",
-                "IS",
-                "NULL",
-                "DISTINCT",
-                "ALL",
-                "ANY",
-                "SOME",
-            }
-
-            # Match FROM keyword followed by table name (optionally schema.table)
-            # Pattern: \bFROM\s+ matches FROM with word boundary followed by whitespace
-            # ([a-zA-Z_][a-zA-Z0-9_]*(?:\.[a-zA-Z_][a-zA-Z0-9_]*)?) captures table or schema.table
-            match = re.search(
-                r"\bFROM\s+([a-zA-Z_][a-zA-Z0-9_]*(?:\.[a-zA-Z_][a-zA-Z0-9_]*)?)\b", query, re.IGNORECASE
-            )
-
-            if match:
-                candidate = match.group(1)
-                # Validate the candidate is not a SQL keyword (check table part for schema.table)
-                table_part = candidate.split(".")[-1]
-                if table_part.upper() not in sql_keywords:
-                    table_name = candidate
+            # The parser has already extracted the table name; use it for metadata
+            table_name = table
 
         # Get column metadata from tap_schema.db
-        column_metadata = get_column_metadata(table_name)
+        column_metadata = get_column_metadata(table_name, result_columns)
 
         # Create query info
         query_info = {"query": query, "table": table_name}
 
-        # Generate response based on format
-        if output_format in ["votable", "votable/td"]:
-            xml_response = create_votable_response(data, result_columns, query_info, column_metadata)
-            return Response(xml_response, mimetype="application/xml")
-        else:
-            error_msg = f"Unsupported format: {output_format}"
-            app.logger.warning("Unsupported output format requested: %s", output_format)
-            return Response(create_error_votable(error_msg, query), mimetype="application/xml", status=400)
+        # Generate the VOTable response.  The header is built here, so that a
+        # failure before any rows are written is still reported with a 500.
+        xml_chunks = stream_votable(data, result_columns, query_info, column_metadata)
+        header = next(xml_chunks)
+        return Response(itertools.chain((header,), xml_chunks), mimetype="application/xml")
 
     except Exception as e:
         error_msg = f"Error processing query: {str(e)}"
@@ -513,10 +661,7 @@ def sync_query():
         return Response(create_error_votable(error_msg, query), mimetype="application/xml", status=500)
 
 
-@app.route("/capabilities")
-def capabilities():
-    """Return service capabilities in VOSI format."""
-    xml = """<?xml version="1.0" encoding="UTF-8"?>
+CAPABILITIES_XML = """<?xml version="1.0" encoding="UTF-8"?>
 <capabilities xmlns="http://www.ivoa.net/xml/VOSICapabilities/v1.0"
               xmlns:vr="http://www.ivoa.net/xml/VOResource/v1.0"
               xmlns:tr="http://www.ivoa.net/xml/TAPRegExt/v1.0"
@@ -550,7 +695,21 @@ def capabilities():
     </capability>
 </capabilities>
 """
-    return Response(xml, mimetype="application/xml")
+_CAPABILITIES_BYTES = CAPABILITIES_XML.encode("utf-8")
+
+
+@app.route("/capabilities")
+def capabilities():
+    """Return service capabilities in VOSI format."""
+    return Response(
+        _CAPABILITIES_BYTES, mimetype="application/xml", headers={"Cache-Control": STATIC_CACHE_CONTROL}
+    )
+
+
+# Minimal valid tableset, returned when tap_schema.db cannot be read
+EMPTY_TABLESET_XML = (
+    '<?xml version="1.0" encoding="UTF-8"?>\n<tableset xmlns="http://www.ivoa.net/xml/VODataService/v1.1"/>'
+)
 
 
 def generate_tables_xml():
@@ -564,71 +723,77 @@ def generate_tables_xml():
     tableset = ET.Element("tableset", {"xmlns": "http://www.ivoa.net/xml/VODataService/v1.1"})
 
     try:
-        # Query schemas from database
-        tap_schema_db.connect()
-        schemas = tap_schema_db.query("SELECT schema_name, description FROM schemas ORDER BY schema_name")
-
-        for schema_row in schemas:
-            schema_name = schema_row["schema_name"]
+        # Fetch schemas, tables and columns in a single query, ordered so that
+        # they can be grouped in one pass.  Table names in the columns table
+        # are fully qualified (schema.table).  The outer joins keep schemas
+        # without tables and tables without columns.
+        rows = tap_schema_db.query_tuples(
+            """
+            SELECT s.schema_name, s.description,
+                   t.table_name, t.description,
+                   c.column_name, c.datatype, c.unit, c.ucd, c.description
+            FROM schemas s
+            LEFT JOIN tables t ON t.schema_name = s.schema_name
+            LEFT JOIN columns c ON c.table_name = t.schema_name || '.' || t.table_name
+            ORDER BY s.schema_name, t.table_name, c.column_name
+            """
+        )
+
+        for schema_name, schema_rows in itertools.groupby(rows, key=operator.itemgetter(0)):
+            schema_rows = list(schema_rows)
+            schema_description = schema_rows[0][1]
 
             # Create schema element
             schema_elem = ET.SubElement(tableset, "schema")
             name_elem = ET.SubElement(schema_elem, "name")
             name_elem.text = schema_name
 
-            if schema_row.get("description"):
+            if schema_description:
                 desc_elem = ET.SubElement(schema_elem, "description")
-                desc_elem.text = schema_row["description"]
-
-            # Query tables for this schema
-            tables = tap_schema_db.query(
-                "SELECT table_name, description FROM tables WHERE schema_name = ? ORDER BY table_name",
-                (schema_name,),
-            )
+                desc_elem.text = schema_description
 
-            for table_row in tables:
-                table_name = table_row["table_name"]
+            for table_name, table_rows in itertools.groupby(schema_rows, key=operator.itemgetter(2)):
+                if table_name is None:
+                    # Schema without any tables
+                    continue
+                table_rows = list(table_rows)
+                table_description = table_rows[0][3]
 
                 # Create table element
                 table_elem = ET.SubElement(schema_elem, "table")
                 table_name_elem = ET.SubElement(table_elem, "name")
                 table_name_elem.text = table_name
 
-                if table_row.get("description"):
+                if table_description:
                     table_desc_elem = ET.SubElement(table_elem, "description")
-                    table_desc_elem.text = table_row["description"]
-
-                # Query columns for this table
-                # Table names in columns table are fully qualified (schema.table)
-                full_table_name = f"{schema_name}.{table_name}"
-                columns = tap_schema_db.query(
-                    "SELECT column_name, datatype, unit, ucd, description "
-                    "FROM columns WHERE table_name = ? ORDER BY column_name",
-                    (full_table_name,),
-                )
-
-                for column_row in columns:
+                    table_desc_elem.text = table_description
+
+                for *_, column_name, datatype, unit, ucd, column_description in table_rows:
+                    if column_name is None:
+                        # Table without any columns
+                        continue
+
                     # Create column element
                     column_elem = ET.SubElement(table_elem, "column")
 
                     col_name_elem = ET.SubElement(column_elem, "name")
-                    col_name_elem.text = column_row["column_name"]
+                    col_name_elem.text = column_name
 
-                    if column_row.get("datatype"):
+                    if datatype:
                         datatype_elem = ET.SubElement(column_elem, "dataType")
-                        datatype_elem.text = column_row["datatype"]
+                        datatype_elem.text = datatype
 
-                    if column_row.get("unit"):
+                    if unit:
                         unit_elem = ET.SubElement(column_elem, "unit")
-                        unit_elem.text = column_row["unit"]
+                        unit_elem.text = unit
 
-                    if column_row.get("ucd"):
+                    if ucd:
                         ucd_elem = ET.SubElement(column_elem, "ucd")
-                        ucd_elem.text = column_row["ucd"]
+                        ucd_elem.text = ucd
 
-                    if column_row.get("description"):
+                    if column_description:
                         col_desc_elem = ET.SubElement(column_elem, "description")
-                        col_desc_elem.text = column_row["description"]
+                        col_desc_elem.text = column_description
 
         # Format and return the XML with proper indentation
         return format_xml_with_indentation(tableset)
@@ -636,16 +801,58 @@ def generate_tables_xml():
     except Exception as e:
         app.logger.error("Failed to generate tables XML from tap_schema.db: %s", str(e), exc_info=True)
         # Return minimal valid XML on error
-        return '<?xml version="1.0" encoding="UTF-8"?>\n<tableset xmlns="http://www.ivoa.net/xml/VODataService/v1.1"/>'
+        return EMPTY_TABLESET_XML
+
+
+# The rendered /tables document, keyed on the path, mtime and size of tap_schema.db (and its WAL)
+_tables_xml_cache = {"key": None, "xml": None}
+_tables_xml_lock = threading.Lock()
+
+
+def _tables_xml_cache_key():
+    """Identify the current state of tap_schema.db, or None if it cannot be stat'ed."""
+    db_path = tap_schema_db.db_path
+    try:
+        stat = os.stat(db_path)
+    except OSError:
+        return None
+    # In WAL mode, recent writes live in the -wal file until they are checkpointed
+    try:
+        wal_stat = os.stat(db_path + "-wal")
+        wal_key = (wal_stat.st_mtime_ns, wal_stat.st_size)
+    except OSError:
+        wal_key = None
+    return (db_path, stat.st_mtime_ns, stat.st_size, wal_key)
 
 
 @app.route("/tables")
 def tables():
     """Return available tables metadata from tap_schema.db."""
-    xml = generate_tables_xml()
+    key = _tables_xml_cache_key()
+    with _tables_xml_lock:
+        if key is not None and key == _tables_xml_cache["key"]:
+            xml = _tables_xml_cache["xml"]
+        else:
+            xml = generate_tables_xml()
+            # Don't hold on to the fallback document produced when the database is unreadable
+            if key is not None and xml is not EMPTY_TABLESET_XML:
+                _tables_xml_cache.update(key=key, xml=xml)
     return Response(xml, mimetype="application/xml")
 
 
+def clear_cache():
+    """
+    Drop cached metadata, e.g. after tap_schema.db changes on disk.
+
+    This is deliberately not exposed as an HTTP endpoint: the server has no
+    authentication, and any client could otherwise keep emptying the caches.
+    """
+    get_column_metadata.cache_clear()
+    with _tables_xml_lock:
+        _tables_xml_cache.update(key=None, xml=None)
+    app.logger.info("Cleared metadata caches")
+
+
 def main():
     """Main entry point for the TAP server."""
     parser = argparse.ArgumentParser(description="TAP Server Prototype")
@@ -664,7 +871,7 @@ def main():
     if args.debug:
         app.logger.info("Debug mode enabled")
     app.logger.info("Press Ctrl+C to stop the server")
-    app.run(host="0.0.0.0", port=port, debug=args.debug)
+    create_app().run(host="0.0.0.0", port=port, debug=args.debug)
 
 
 if __name__ == "__main__":
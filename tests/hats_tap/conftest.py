@@ -0,0 +1,80 @@
+import pathlib
+import shutil
+
+import pytest
+from hats_tap import tap_server
+from hats_tap.tap_schema_db import TAPSchemaDatabase
+
+
+@pytest.fixture(scope="session")
+def samples_dir():
+    """Get the path to the directory of sample ADQL queries."""
+    return pathlib.Path(__file__).parent.parent.parent / "src" / "hats_tap" / "samples"
+
+
+@pytest.fixture(scope="session")
+def sample_adql(samples_dir):
+    """Map each sample file name (e.g. 'sample1.adql') to its query text, read once per session."""
+    return {path.name: path.read_text() for path in sorted(samples_dir.glob("*.adql"))}
+
+
+@pytest.fixture(scope="session")
+def template_db(tmp_path_factory):
+    """Create an empty TAP_SCHEMA database once per session, to be copied by tests."""
+    path = tmp_path_factory.mktemp("template") / "tap_schema.db"
+    db = TAPSchemaDatabase(str(path))
+    db.initialize_schema()
+    db.close()
+    return path
+
+
+@pytest.fixture
+def tap_schema_db_path(template_db, tmp_path):
+    """Get the path to a fresh copy of the empty TAP_SCHEMA database, private to the test."""
+    path = tmp_path / "tap_schema.db"
+    shutil.copy(template_db, path)
+    return str(path)
+
+
+@pytest.fixture(scope="session")
+def app():
+    """Get the TAP server's Flask application, configured for testing once per session."""
+    app = tap_server.create_app()
+    app.config["TESTING"] = True
+    return app
+
+
+@pytest.fixture(scope="session")
+def tap_schema_db():
+    """
+    Build a small, read-only Gaia DR3 TAP_SCHEMA database once per session.
+
+    The database lives in memory and is attached as tap_schema, like the
+    server's own database.  Tests that modify metadata need a copy of their own.
+    memdb databases are private to a process, so each pytest-xdist worker
+    builds its own.
+    """
+    db = TAPSchemaDatabase("file:/gaia_dr3_tap_schema?vfs=memdb", qualified="tap_schema")
+    db.initialize_schema()
+    with db.bulk():
+        db.insert_schema("gaia_dr3", "Gaia Data Release 3")
+        db.insert_tables(
+            [
+                {"schema_name": "gaia_dr3", "table_name": "gaia", "description": "Gaia DR3 sources"},
+                {"schema_name": "gaia_dr3", "table_name": "parent", "description": "Parent objects"},
+            ]
+        )
+        db.insert_columns(
+            "gaia_dr3.gaia",
+            [
+                {"column_name": "source_id", "datatype": "long", "ucd": "meta.id;meta.main"},
+                {"column_name": "parent_id", "datatype": "long", "ucd": "meta.id"},
+                {"column_name": "ra", "datatype": "double", "unit": "deg", "ucd": "pos.eq.ra"},
+                {"column_name": "dec", "datatype": "double", "unit": "deg", "ucd": "pos.eq.dec"},
+            ],
+        )
+        db.insert_columns(
+            "gaia_dr3.parent", [{"column_name": "id", "datatype": "long", "ucd": "meta.id;meta.main"}]
+        )
+    yield db
+    db.close()
@@ -1,85 +1,97 @@
 """Tests for the adql_to_lsdb module, specifically parse_adql_entities."""
 
-import pathlib
-
 import pytest
-from hats_tap.adql_to_lsdb import parse_adql_entities
+from hats_tap.adql_to_lsdb import (
+    TwoStageADQLQueryTranslator,
+    _parse_adql_entities_cached,
+    _parse_adql_subset,
+    _parse_with_antlr,
+    parse_adql_entities,
+    warm_up_parser,
+)
+from queryparser.adql.adqltranslator import ADQLQueryTranslator
+from queryparser.exceptions import QuerySyntaxError
+
+
+# Expected parse_adql_entities() results for the sample queries in tests/data
+_SAMPLE1_EXPECTED = {
+    "tables": ["gaia_dr3.gaia"],
+    "columns": ["source_id", "ra", "dec", "phot_g_mean_mag", "phot_variable_flag"],
+    "spatial_search": {"type": "ConeSearch", "ra": 270.0, "dec": 23.0, "radius": 0.25},
+    "conditions": [("phot_g_mean_mag", "<", 16), ("phot_variable_flag", "==", "VARIABLE")],
+    "limits": 15,
+    "order_by": [],
+}
+
+_SAMPLE2_EXPECTED = {
+    "tables": ["ztf_dr22"],
+    "columns": ["objectid", "objra", "objdec", "nepochs", "mag", "magerr"],
+    "spatial_search": {"type": "ConeSearch", "ra": 280.0, "dec": 0.0, "radius": 0.1},
+    "conditions": [("nepochs", ">", 10), ("lc.mag", "<", 16)],
+    "limits": 15,
+    "order_by": [],
+}
+
+_SAMPLE3_EXPECTED = {
+    "tables": ["ztf_dr22"],
+    "columns": ["objectid", "objra", "objdec"],
+    "spatial_search": {
+        "type": "PolygonSearch",
+        "coordinates": [(280.0, 30.0), (281.0, 30.0), (281.0, 29.0), (279.0, 27.0)],
+    },
+    "conditions": [],
+    "limits": 10,
+    "order_by": [],
+}
+
+# Exercises scientific notation: 1.2e-3 = 0.0012
+_SAMPLE4_EXPECTED = {
+    "tables": ["ztf_dr22"],
+    "columns": ["designation", "ra", "dec"],
+    "spatial_search": {
+        "type": "PolygonSearch",
+        "coordinates": [(280.0, 0.0012), (266.0, 2.0), (266.0, -3.0)],
+    },
+    "conditions": [],
+    "limits": 10,
+    "order_by": [],
+}
+
+_SAMPLE5_EXPECTED = {
+    "tables": ["ztf_dr22"],
+    "columns": ["objectid", "objra", "objdec"],
+    "spatial_search": {
+        "type": "PolygonSearch",
+        "coordinates": [(280.0, 0.0012), (266.0, 2.0), (266.0, -3.0)],
+    },
+    "conditions": [],
+    "limits": 10,
+    "order_by": [("ra", True), ("dec", False)],
+}
 
 
 class TestSampleQueries:
     """Test that sample ADQL files parse correctly."""
 
-    @pytest.fixture
-    def samples_dir(self):
-        """Get the path to the samples directory."""
-        return pathlib.Path(__file__).parent.parent.parent / "src" / "hats_tap" / "samples"
-
-    def test_sample1_parses(self, samples_dir):
+    def test_sample1_parses(self, sample_adql):
         """Test sample1.adql parses correctly with expected entities."""
-        adql = (samples_dir / "sample1.adql").read_text()
-        result = parse_adql_entities(adql)
+        assert parse_adql_entities(sample_adql["sample1.adql"]) == _SAMPLE1_EXPECTED
 
-        assert result["tables"] == ["gaia_dr3.gaia"]
-        assert result["columns"] == ["source_id", "ra", "dec", "phot_g_mean_mag", "phot_variable_flag"]
-        assert result["spatial_search"] == {
-            "type": "ConeSearch",
-            "ra": 270.0,
-            "dec": 23.0,
-            "radius": 0.25,
-        }
-        assert result["limits"] == 15
-        assert ("phot_g_mean_mag", "<", 16) in result["conditions"]
-        assert ("phot_variable_flag", "==", "VARIABLE") in result["conditions"]
-
-    def test_sample2_parses(self, samples_dir):
+    def test_sample2_parses(self, sample_adql):
         """Test sample2.adql parses correctly with expected entities."""
-        adql = (samples_dir / "sample2.adql").read_text()
-        result = parse_adql_entities(adql)
+        assert parse_adql_entities(sample_adql["sample2.adql"]) == _SAMPLE2_EXPECTED
 
-        assert result["tables"] == ["ztf_dr22"]
-        assert result["columns"] == ["objectid", "objra", "objdec", "nepochs", "mag", "magerr"]
-        assert result["spatial_search"] == {
-            "type": "ConeSearch",
-            "ra": 280.0,
-            "dec": 0.0,
-            "radius": 0.1,
-        }
-        assert result["limits"] == 15
-
-    def test_sample3_polygon_parses(self, samples_dir):
+    def test_sample3_polygon_parses(self, sample_adql):
         """Test sample3.adql with POLYGON parses correctly."""
-        adql = (samples_dir / "sample3.adql").read_text()
-        result = parse_adql_entities(adql)
-
-        assert result["tables"] == ["ztf_dr22"]
-        assert result["columns"] == ["objectid", "objra", "objdec"]
-        assert result["spatial_search"]["type"] == "PolygonSearch"
-        assert result["spatial_search"]["coordinates"] == [
-            (280.0, 30.0),
-            (281.0, 30.0),
-            (281.0, 29.0),
-            (279.0, 27.0),
-        ]
-        assert result["limits"] == 10
+        assert parse_adql_entities(sample_adql["sample3.adql"]) == _SAMPLE3_EXPECTED
 
-    def test_sample4_scientific_notation_parses(self, samples_dir):
+    def test_sample4_scientific_notation_parses(self, sample_adql):
         """Test sample4.adql with scientific notation parses correctly."""
-        adql = (samples_dir / "sample4.adql").read_text()
-        result = parse_adql_entities(adql)
-
-        assert result["tables"] == ["ztf_dr22"]
-        assert result["spatial_search"]["type"] == "PolygonSearch"
-        # Verify scientific notation parsing: 1.2e-3 = 0.0012
-        coords = result["spatial_search"]["coordinates"]
-        assert coords[0] == (280.0, pytest.approx(0.0012))
+        assert parse_adql_entities(sample_adql["sample4.adql"]) == _SAMPLE4_EXPECTED
 
-    def test_sample5_order_by_parses(self, samples_dir):
+    def test_sample5_order_by_parses(self, sample_adql):
         """Test sample5.adql with ORDER BY parses correctly."""
-        adql = (samples_dir / "sample5.adql").read_text()
-        result = parse_adql_entities(adql)
-
-        assert result["tables"] == ["ztf_dr22"]
-        assert result["order_by"] == [("ra", True), ("dec", False)]
+        assert parse_adql_entities(sample_adql["sample5.adql"]) == _SAMPLE5_EXPECTED
 
 
 class TestMultipleContainsValidation:
@@ -102,6 +114,35 @@ class TestMultipleContainsValidation:
         with pytest.raises(ValueError, match="Multiple CONTAINS"):
             parse_adql_entities(adql)
 
+    def test_multiple_contains_with_nested_parentheses_raises_value_error(self):
+        """Deeply nested parentheses around the CONTAINS clauses parse and are still rejected."""
+        depth = 25
+        contains = "1 = CONTAINS(POINT('ICRS', ra, dec), CIRCLE('ICRS', {}, 23.0, 0.25))"
+        adql = f"""
+        SELECT ra, dec
+        FROM gaiadr3.gaia
+        WHERE {"(" * depth}{contains.format(270.0)}{")" * depth}
+        AND {"(" * depth}{contains.format(280.0)}{")" * depth}
+        """
+        with pytest.raises(ValueError, match="Multiple CONTAINS"):
+            parse_adql_entities(adql)
+
+    def test_nested_parentheses_in_contains_arguments(self):
+        """Arguments wrapped in 20+ levels of parentheses are unwrapped."""
+        depth = 25
+        adql = f"""
+        SELECT ra, dec
+        FROM gaiadr3.gaia
+        WHERE 1 = CONTAINS(
+            POINT('ICRS', ra, dec),
+            CIRCLE('ICRS', {"(" * depth}270.0{")" * depth}, {"(" * depth}-23.0{")" * depth}, 0.25)
+        )
+        AND {"(" * depth}phot_g_mean_mag < 16{")" * depth}
+        """
+        result = parse_adql_entities(adql)
+        assert result["spatial_search"] == {"type": "ConeSearch", "ra": 270.0, "dec": -23.0, "radius": 0.25}
+        assert result["conditions"] == [("phot_g_mean_mag", "<", 16)]
+
     def test_single_contains_succeeds(self):
         """Test that a query with one CONTAINS clause works."""
         adql = """
@@ -396,3 +437,180 @@ class TestEntityDictionary:
         assert len(order_by) == 2
         assert order_by[0] == ("objra", True)  # ASC = True
         assert order_by[1] == ("objdec", False)  # DESC = False
+
+    def test_condition_literal_values(self):
+        """Numeric literals become numbers; other identifiers, even 'inf', stay strings."""
+        adql = """
+        SELECT ra, dec, mag, flag
+        FROM gaiadr3.gaia
+        WHERE mag < 1.5e1 AND dec >= -30 AND ra > .5 AND flag = inf
+        """
+        result = parse_adql_entities(adql)
+        assert result["conditions"] == [
+            ("mag", "<", 15),
+            ("dec", ">=", -30),
+            ("ra", ">", 0.5),
+            ("flag", "==", "inf"),
+        ]
+
+
+class TestParseCache:
+    """Test that repeated queries are served from the parse cache."""
+
+    def test_repeated_query_is_cached_and_copied(self):
+        """Identical queries are parsed once, and each call gets its own entities."""
+        adql = "SELECT TOP 5 ra, dec FROM gaiadr3.gaia WHERE phot_g_mean_mag < 16"
+        parse_adql_entities.cache_clear()
+
+        first = parse_adql_entities(adql)
+        first["columns"].append("mutated")
+        second = parse_adql_entities(adql)
+
+        assert second["columns"] == ["ra", "dec"]
+        assert second["conditions"] == [("phot_g_mean_mag", "<", 16)]
+        assert _parse_adql_entities_cached.cache_info().hits == 1
+
+    def test_whitespace_variants_share_a_cache_entry(self):
+        """Queries differing only in layout are parsed once; string literals keep their spaces."""
+        parse_adql_entities.cache_clear()
+
+        first = parse_adql_entities("SELECT ra, dec FROM gaiadr3.gaia WHERE flag = 'A  B'")
+        second = parse_adql_entities("SELECT ra,\n       dec\n  FROM gaiadr3.gaia\n WHERE flag = 'A  B'\n")
+
+        assert first == second
+        assert second["conditions"] == [("flag", "==", "A  B")]
+        assert _parse_adql_entities_cached.cache_info().hits == 1
+
+    def test_syntax_error_positions_refer_to_original_query(self):
+        """Errors in a reformatted query report positions in the query as written."""
+        with pytest.raises(ValueError, match=r"\(3, 11, '<'\)"):
+            parse_adql_entities("SELECT ra\n  FROM t\n WHERE ra << 3")
+
+    def test_warm_up_does_not_fill_cache(self):
+        """Warming up the parser parses without memoizing the warm-up queries."""
+        parse_adql_entities.cache_clear()
+        warm_up_parser()
+        assert _parse_adql_entities_cached.cache_info().currsize == 0
+
+
+class TestTwoStageParsing:
+    """Test that SLL-first parsing matches queryparser's full LL parse."""
+
+    @pytest.mark.parametrize("sample", ["sample1.adql", "sample3.adql", "sample5.adql"])
+    def test_same_tree_as_queryparser(self, sample_adql, sample):
+        """The two-stage parser builds the same parse tree as ADQLQueryTranslator."""
+        adql = sample_adql[sample]
+        two_stage = TwoStageADQLQueryTranslator(adql)
+        reference = ADQLQueryTranslator(adql)
+        assert two_stage.tree.toStringTree(recog=two_stage.parser) == reference.tree.toStringTree(
+            recog=reference.parser
+        )
+
+    def test_syntax_errors_match_queryparser(self):
+        """Syntax errors fall back to the LL parse and are reported like queryparser does."""
+        adql = "SELECT ra dec FROM"
+        with pytest.raises(QuerySyntaxError) as reference:
+            ADQLQueryTranslator(adql)
+        with pytest.raises(QuerySyntaxError) as two_stage:
+            TwoStageADQLQueryTranslator(adql)
+        assert two_stage.value.syntax_errors == reference.value.syntax_errors
+
+
+class TestStructuralPrecheck:
+    """Test the regex pre-checks that run before the full parse."""
+
+    @pytest.mark.parametrize(
+        ("adql", "error", "match"),
+        [
+            (
+                "SELECT ra, dec FROM t WHERE 1 = CONTAINS(POINT('ICRS', ra, dec), CIRCLE('ICRS', 1, 2, 3)) "
+                "AND 1 = CONTAINS(POINT('ICRS', ra, dec), CIRCLE('ICRS', 4, 5, 6))",
+                ValueError,
+                "Multiple CONTAINS",
+            ),
+            ("SELECT ra, dec, POINT('ICRS', ra, dec) AS pos FROM t", ValueError, "POINT outside of CONTAINS"),
+            (
+                "SELECT ra, dec FROM t WHERE 1 = CONTAINS(POINT('FK5', ra, dec), CIRCLE('ICRS', 1, 2, 3))",
+                NotImplementedError,
+                "Unimplemented ADQL feature",
+            ),
+        ],
+    )
+    def test_rejected_without_parsing(self, monkeypatch, adql, error, match):
+        """Structural violations are detected before the ADQL parser runs."""
+
+        def fail(*args, **kwargs):
+            raise AssertionError("the parser should not be invoked")
+
+        monkeypatch.setattr("hats_tap.adql_to_lsdb.TwoStageADQLQueryTranslator", fail)
+        with pytest.raises(error, match=match):
+            parse_adql_entities(adql)
+
+    def test_literals_are_ignored(self):
+        """Function names inside string literals do not trip the pre-checks."""
+        adql = """
+        SELECT ra, dec, flag
+        FROM gaiadr3.gaia
+        WHERE 1 = CONTAINS(POINT('ICRS', ra, dec), CIRCLE('ICRS', 270.0, 23.0, 0.25))
+        AND flag = 'POINT(CIRCLE('
+        """
+        result = parse_adql_entities(adql)
+        assert result["spatial_search"]["type"] == "ConeSearch"
+        assert result["conditions"] == [("flag", "==", "POINT(CIRCLE(")]
+
+
+class TestSubsetParser:
+    """Test that the hand-written subset parser agrees with the full ANTLR parse."""
+
+    @pytest.mark.parametrize(
+        "sample", ["sample1.adql", "sample2.adql", "sample3.adql", "sample4.adql", "sample5.adql"]
+    )
+    def test_samples_match_full_parse(self, sample_adql, sample):
+        """The sample queries are handled by the subset parser, with identical entities."""
+        adql = sample_adql[sample]
+        entities = _parse_adql_subset(adql)
+        assert entities is not None
+        assert entities == _parse_with_antlr(adql)
+
+    @pytest.mark.parametrize(
+        "adql",
+        [
+            "SELECT ra, dec FROM t",
+            "select top 5 ra, dec from gaia.src where mag < 16 and flag = 'a b'",
+            "SELECT t.ra, t.dec FROM t WHERE t.mag <= -3.5e2 AND mag >= + 3 AND mag <> .5 "
+            "ORDER BY ra DESC, dec",
+            "SELECT ra, dec FROM t WHERE mag < 1. ORDER BY mag ASC",
+            "SELECT ra, dec FROM t WHERE x > 2 "
+            "AND CONTAINS(POINT('icrs', ra, dec), CIRCLE('ICRS', -10, +2, 1)) = 1",
+            "SELECT ra,dec FROM t WHERE 1=contains(point('ICRS',ra,dec),polygon('ICRS',1,2,3,4,5,6))",
+        ],
+    )
+    def test_queries_match_full_parse(self, adql):
+        """Queries within the subset give the same entities as the full parse."""
+        entities = _parse_adql_subset(adql)
+        assert entities is not None
+        assert entities == _parse_with_antlr(adql)
+
+    @pytest.mark.parametrize(
+        "adql",
+        [
+            # Outside the subset, but accepted by the full parser
+            "SELECT ra, dec FROM t WHERE mag < 16 OR mag > 20",
+            "SELECT ra, dec FROM t WHERE flag = 'it''s'",
+            "SELECT ra, dec FROM t WHERE ra = dec",
+            "SELECT ra FROM t -- comment",
+            # Rejected by the full parser or by LSDBFormatListener
+            "SELECT * FROM t",
+            "SELECT TOP 0 ra FROM t",
+            "SELECT size FROM t",
+            "SELECT ra FROM t WHERE mag < 1e4",
+            "SELECT ra FROM s.t.u",
+            "SELECT ra FROM leftovers",
+            "SELECT ra FROM t order by ra",
+            "SELECT ra, dec FROM t WHERE 1 = CONTAINS(POINT('ICRS', ra, x), CIRCLE('ICRS', 1, 2, 3))",
+            "SELECT ra, dec FROM t WHERE 1 = CONTAINS(POINT('ICRS', ra, dec), CIRCLE('ICRS', 1, 2))",
+        ],
+    )
+    def test_other_queries_fall_back(self, adql):
+        """Anything outside the subset is left to the full parser."""
+        assert _parse_adql_subset(adql) is None
@@ -0,0 +1,191 @@
+"""Tests for importing TAP_SCHEMA metadata from an external TAP server."""
+
+import re
+
+import pytest
+from hats_tap.import_tap_schema import TAPSchemaImporter
+from hats_tap.tap_schema_db import TAPSchemaDatabase
+
+
+class MockResult:
+    """A mock pyvo TAP result: iterable rows, indexed by column name, plus the result's field names."""
+
+    def __init__(self, rows):
+        self.fieldnames = list(dict.fromkeys(name for row in rows for name in row))
+        # Plain dictionaries with every field present, as each pyvo row has
+        self.rows = [{name: row.get(name) for name in self.fieldnames} for row in rows]
+
+    def __iter__(self):
+        return iter(self.rows)
+
+
+class MockTAPService:
+    """
+    Stand-in for pyvo.dal.TAPService.
+
+    Each query is answered with the rows of the first pattern that occurs in
+    the query text, or with an empty result.
+    """
+
+    def __init__(self, responses):
+        self.responses = list(responses.items())
+        self.queries = []
+        self._dispatch = None
+
+    def _build(self):
+        # One alternative per pattern, each a lookahead anchored at the start of
+        # the query, so a single match() finds the first pattern (in order) that
+        # occurs anywhere in the query.
+        self._dispatch = re.compile(
+            "|".join(
+                f"(?=.*?(?P<k{i}>{re.escape(pattern)}))" for i, (pattern, _) in enumerate(self.responses)
+            ),
+            re.DOTALL,
+        )
+
+    def search(self, query):
+        """Record the query and return the rows of the first matching pattern."""
+        self.queries.append(query)
+        if self._dispatch is None:
+            self._build()
+        match = self._dispatch.match(query) if self.responses else None
+        if match is None:
+            return MockResult([])
+        return MockResult(self.responses[int(match.lastgroup[1:])][1])
+
+
+GAIA_COLUMNS = [
+    {
+        "table_name": "gaiadr3.gaia_source",
+        "column_name": name,
+        "description": f"The {name} column",
+        "unit": unit,
+        "ucd": ucd,
+        "utype": None,
+        "datatype": datatype,
+        "size": None,
+        "principal": 1,
+        "indexed": 0,
+        "std": 0,
+    }
+    for name, unit, ucd, datatype in [
+        ("source_id", None, "meta.id;meta.main", "long"),
+        ("ra", "deg", "pos.eq.ra;meta.main", "double"),
+        ("dec", "deg", "pos.eq.dec;meta.main", "double"),
+        ("phot_g_mean_mag", "mag", "phot.mag;em.opt.G", "float"),
+    ]
+]
+
+TAP_SCHEMA_RESPONSES = {
+    "TAP_SCHEMA.schemas WHERE schema_name = 'gaiadr3'": [
+        {"schema_name": "gaiadr3", "description": "Gaia DR3", "utype": None}
+    ],
+    "TAP_SCHEMA.tables WHERE table_name = 'gaiadr3.gaia_source'": [
+        {
+            "schema_name": "gaiadr3",
+            "table_name": "gaiadr3.gaia_source",
+            "table_type": "table",
+            "description": "Gaia DR3 sources",
+            "utype": None,
+        }
+    ],
+    "TAP_SCHEMA.tables WHERE schema_name = 'gaiadr3'": [
+        {
+            "schema_name": "gaiadr3",
+            "table_name": "gaia_source",
+            "table_type": "table",
+            "description": "Gaia DR3 sources",
+            "utype": None,
+        }
+    ],
+    "TAP_SCHEMA.columns WHERE table_name = 'gaiadr3.gaia_source'": GAIA_COLUMNS,
+    "TAP_SCHEMA.keys": [
+        {
+            "key_id": "gaia_source_parent",
+            "from_table": "gaiadr3.gaia_source",
+            "target_table": "gaiadr3.parent",
+            "description": None,
+            "utype": None,
+        }
+    ],
+    "TAP_SCHEMA.key_columns WHERE key_id = 'gaia_source_parent'": [
+        {"key_id": "gaia_source_parent", "from_column": "parent_id", "target_column": "id"}
+    ],
+}
+
+
+@pytest.fixture
+def importer(tap_schema_db_path):
+    """Importer backed by a mock TAP service and a temporary local database."""
+    importer = TAPSchemaImporter("https://tap.example.org/tap", tap_schema_db_path)
+    importer.service = MockTAPService(TAP_SCHEMA_RESPONSES)
+    importer.db = TAPSchemaDatabase(importer.db_path)
+    yield importer
+    importer.close()
+
+
+def test_import_table_with_schema_qualified_local_name(importer):
+    """Columns and keys of a table imported under a local name are stored under that name."""
+    assert importer.import_table_by_name("gaiadr3.gaia_source", local_table_name="gaia_dr3.gaia")
+
+    db = importer.db
+    assert db.query("SELECT schema_name, table_name FROM tables", as_dict=True) == [
+        {"schema_name": "gaiadr3", "table_name": "gaia_dr3.gaia"}
+    ]
+    columns = db.query("SELECT * FROM columns WHERE table_name = ? ORDER BY column_name", ("gaia_dr3.gaia",))
+    assert [col["column_name"] for col in columns] == ["dec", "phot_g_mean_mag", "ra", "source_id"]
+    ra = next(col for col in columns if col["column_name"] == "ra")
+    assert ra["unit"] == "deg"
+    assert ra["ucd"] == "pos.eq.ra;meta.main"
+    assert ra["datatype"] == "double"
+    assert ra["principal"] == 1
+    assert ra["size"] is None
+
+    assert db.query("SELECT key_id, from_table FROM keys", as_dict=True) == [
+        {"key_id": "gaia_source_parent", "from_table": "gaiadr3.gaia_source"}
+    ]
+    assert db.query("SELECT from_column, target_column FROM key_columns", as_dict=True) == [
+        {"from_column": "parent_id", "target_column": "id"}
+    ]
+
+
+def test_import_schema_metadata(importer):
+    """A whole schema is imported with its tables and columns under their original names."""
+    assert importer.import_schema_metadata("gaiadr3", include_keys=False)
+
+    db = importer.db
+    assert db.query("SELECT schema_name, description FROM schemas", as_dict=True) == [
+        {"schema_name": "gaiadr3", "description": "Gaia DR3"}
+    ]
+    assert db.get_table_count("columns") == len(GAIA_COLUMNS)
+    assert db.query("SELECT DISTINCT table_name FROM columns", as_dict=True) == [
+        {"table_name": "gaiadr3.gaia_source"}
+    ]
+    assert db.get_table_count("keys") == 0
+
+
+def test_import_schema_queries_tables_concurrently(importer):
+    """Columns of several tables are fetched concurrently and stored under their own tables."""
+    parent_columns = [
+        {"table_name": "gaiadr3.parent", "column_name": "id", "datatype": "long"},
+        {"table_name": "gaiadr3.parent", "column_name": "name", "datatype": "char"},
+    ]
+    responses = dict(TAP_SCHEMA_RESPONSES)
+    responses["TAP_SCHEMA.tables WHERE schema_name = 'gaiadr3'"] = [
+        {"schema_name": "gaiadr3", "table_name": "gaia_source"},
+        {"schema_name": "gaiadr3", "table_name": "parent"},
+    ]
+    responses["TAP_SCHEMA.columns WHERE table_name = 'gaiadr3.parent'"] = parent_columns
+    importer.service = MockTAPService(responses)
+    importer.workers = 4
+
+    assert importer.import_schema_metadata("gaiadr3")
+
+    db = importer.db
+    counts = db.query_tuples(
+        "SELECT table_name, COUNT(*) FROM columns GROUP BY table_name ORDER BY table_name"
+    )
+    assert counts == [("gaiadr3.gaia_source", len(GAIA_COLUMNS)), ("gaiadr3.parent", len(parent_columns))]
+    assert db.query("SELECT key_id, from_column FROM key_columns", as_dict=True) == [
+        {"key_id": "gaia_source_parent", "from_column": "parent_id"}
+    ]
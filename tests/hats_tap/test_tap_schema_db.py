@@ -0,0 +1,115 @@
+"""Tests for TAPSchemaDatabase."""
+
+import threading
+
+import pytest
+from hats_tap.tap_schema_db import TAPSchemaDatabase
+
+
+def test_pragmas_applied_to_connection(tmp_path):
+    """Configured PRAGMA settings are applied when a connection is opened."""
+    db = TAPSchemaDatabase(
+        str(tmp_path / "tap_schema.db"), pragmas={"journal_mode": "WAL", "cache_size": -2048}
+    )
+    db.initialize_schema()
+    assert db.connection.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    assert db.connection.execute("PRAGMA cache_size").fetchone()[0] == -2048
+    db.close()
+
+
+def test_invalid_pragma_rejected(tmp_path):
+    """PRAGMA names and values are validated before being interpolated."""
+    db = TAPSchemaDatabase(str(tmp_path / "tap_schema.db"), pragmas={"journal_mode": "WAL; DROP TABLE x"})
+    with pytest.raises(ValueError, match="PRAGMA value"):
+        db.connect()
+
+
+def test_query_tuples_returns_plain_rows(tmp_path):
+    """query_tuples returns positional rows in SELECT order."""
+    with TAPSchemaDatabase(str(tmp_path / "tap_schema.db")) as db:
+        db.initialize_schema()
+        db.insert_schema("public", "Public schema")
+        assert db.query_tuples("SELECT schema_name, description FROM schemas") == [
+            ("public", "Public schema")
+        ]
+        # The shared connection keeps producing dictionaries for query()
+        assert db.query("SELECT schema_name FROM schemas", as_dict=True) == [{"schema_name": "public"}]
+
+
+def test_context_manager_closes_only_the_connection_it_opened(tmp_path):
+    """Leaving a `with` block closes the shared connection only if the outermost block opened it."""
+    db = TAPSchemaDatabase(str(tmp_path / "tap_schema.db"))
+    with db:
+        with db:
+            db.initialize_schema()
+        assert db.connection is not None
+    assert db.connection is None
+
+    db.connect()
+    with db:
+        pass
+    assert db.connection is not None
+    db.close()
+
+
+def test_query_returns_rows(tmp_path):
+    """query returns sqlite3.Row objects, or dictionaries on request."""
+    with TAPSchemaDatabase(str(tmp_path / "tap_schema.db")) as db:
+        db.initialize_schema()
+        db.insert_schema("public", "Public schema")
+        (row,) = db.query("SELECT schema_name, description FROM schemas")
+        assert row["schema_name"] == "public"
+        assert row[1] == "Public schema"
+        assert db.query("SELECT schema_name FROM schemas", as_dict=True) == [{"schema_name": "public"}]
+
+
+def test_in_memory_database_can_be_qualified():
+    """An in-memory database is attached under its qualified name."""
+    db = TAPSchemaDatabase("file:/test_in_memory?vfs=memdb", qualified="tap_schema")
+    db.initialize_schema()
+    db.insert_schema("public", "Public schema")
+    assert db.query_tuples("SELECT schema_name FROM tap_schema.schemas") == [("public",)]
+    db.close()
+
+    # The database is gone once its connection is closed
+    db.initialize_schema()
+    assert db.get_table_count("schemas") == 0
+    db.close()
+
+
+def test_bulk_commits_once(tap_schema_db_path):
+    """Writes in a bulk() block are committed together, or not at all."""
+    db = TAPSchemaDatabase(tap_schema_db_path)
+    with db.bulk():
+        db.insert_schema("public", "Public schema")
+        db.insert_table("public", "ztf_dr14")
+        db.insert_columns("public.ztf_dr14", [{"column_name": "ra"}, {"column_name": "dec"}])
+        assert db.connection.in_transaction
+    assert not db.connection.in_transaction
+    assert db.get_table_count("columns") == 2
+
+    with pytest.raises(RuntimeError), db.bulk():
+        db.insert_schema("other")
+        with db.bulk():
+            db.insert_table("other", "t")
+        raise RuntimeError("abort the import")
+    assert db.query_tuples("SELECT schema_name FROM schemas") == [("public",)]
+    assert db.get_table_count("tables") == 1
+    db.close()
+
+
+def test_readers_wait_for_bulk_writes(tap_schema_db_path):
+    """Other threads never see the uncommitted writes of a bulk() block, nor can it be closed early."""
+    db = TAPSchemaDatabase(tap_schema_db_path)
+    counts = []
+    reader = threading.Thread(target=lambda: counts.append(db.get_table_count("schemas")))
+    with db.bulk():
+        db.insert_schema("public")
+        reader.start()
+        reader.join(timeout=0.2)
+        assert reader.is_alive()
+        with pytest.raises(RuntimeError, match="bulk"):
+            db.close()
+    reader.join()
+    assert counts == [1]
+    db.close()
@@ -11,11 +11,9 @@ class TestThreadSafety:
     """Test that TAPSchemaDatabase is thread-safe."""
 
     @pytest.fixture
-    def temp_db(self, tmp_path):
+    def temp_db(self, tap_schema_db_path):
         """Create a temporary database for testing."""
-        db_path = tmp_path / "test_tap_schema.db"
-        db = TAPSchemaDatabase(str(db_path))
-        db.initialize_schema()
+        db = TAPSchemaDatabase(tap_schema_db_path)
         # Insert some test data
         db.insert_schema("test_schema", "Test schema")
         db.insert_table("test_schema", "test_table", "table", "Test table")
@@ -54,29 +52,16 @@ class TestThreadSafety:
             assert len(result) == 1
             assert result[0]["schema_name"] == "test_schema"
 
-    def test_each_thread_has_own_connection(self, temp_db):
-        """Test that each thread has its own connection."""
+    def test_threads_share_one_connection(self, temp_db):
+        """Test that all threads use the same connection."""
         connection_ids = []
         lock = threading.Lock()
 
         def get_connection_id():
             """Get the connection ID in a thread."""
             temp_db.connect()
-            conn_id = id(temp_db.connection)
             with lock:
-                connection_ids.append(conn_id)
-            # Letting the temp_db connection dangle until the thread
-            # has terminated is important.  Otherwise the test
-            # occasionally fails, as the reclaimed connection is
-            # reused by the next thread.
-            #
-            # We also cannot collect the connection objects themselves
-            # and close them in batch in the main thread, because only
-            # the thread that opened them can close them.  So we are
-            # content to let the Python finalizer mop these up.
-            # The alternative is to have a complex semaphore system
-            # for the testing threads, which is more than this test
-            # is worth.
+                connection_ids.append(id(temp_db.connection))
 
         # Create multiple threads
         threads = [threading.Thread(target=get_connection_id) for _ in range(5)]
@@ -89,9 +74,41 @@ class TestThreadSafety:
         for thread in threads:
             thread.join()
 
-        # Check that each thread had a different connection
-        assert len(connection_ids) == 5
-        assert len(set(connection_ids)) == 5, "Each thread should have its own connection"
+        # Check that every thread saw the main thread's connection
+        assert connection_ids == [id(temp_db.connection)] * 5
+
+    def test_concurrent_writes(self, temp_db):
+        """Test that writes from several threads are all committed."""
+        errors = []
+
+        def insert_columns(thread_index):
+            """Insert columns in a thread, one write at a time."""
+            try:
+                for i in range(20):
+                    temp_db.insert_column(
+                        "test_schema.test_table", f"col_{thread_index}_{i}", datatype="double"
+                    )
+                    temp_db.query("SELECT COUNT(*) AS n FROM columns")
+            except Exception as e:
+                errors.append(e)
+
+        # Create multiple threads
+        threads = [threading.Thread(target=insert_columns, args=(i,)) for i in range(5)]
+
+        # Start all threads
+        for thread in threads:
+            thread.start()
+
+        # Wait for all threads to complete
+        for thread in threads:
+            thread.join()
+
+        assert len(errors) == 0, f"Expected no errors, but got: {errors}"
+        assert temp_db.get_table_count("columns") == 100
+
+        # The writes are visible to a new connection, so they were committed
+        with TAPSchemaDatabase(temp_db.db_path) as other:
+            assert other.get_table_count("columns") == 100
 
     def test_context_manager_works_with_threads(self, temp_db):
         """Test that context manager works correctly with threads."""
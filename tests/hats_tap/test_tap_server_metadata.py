@@ -0,0 +1,91 @@
+"""Tests for the column metadata lookups in the TAP server."""
+
+import os
+import sqlite3
+
+import pytest
+from hats_tap import tap_server
+from hats_tap.tap_schema_db import TAPSchemaDatabase
+
+
+@pytest.fixture
+def metadata_db(tmp_path, monkeypatch):
+    """Point the TAP server at a small temporary TAP_SCHEMA database."""
+    db = TAPSchemaDatabase(str(tmp_path / "tap_schema.db"), qualified="tap_schema")
+    db.initialize_schema()
+    db.insert_schema("public", "Public schema")
+    db.insert_table("public", "ztf_dr14", "table", "ZTF DR14 objects")
+    db.insert_column("public.ztf_dr14", "ra", datatype="double", unit="deg", ucd="pos.eq.ra")
+    db.insert_column("public.ztf_dr14", "dec", datatype="double", unit="deg", ucd="pos.eq.dec")
+    monkeypatch.setattr(tap_server, "tap_schema_db", db)
+    tap_server.get_column_metadata.cache_clear()
+    yield db
+    tap_server.get_column_metadata.cache_clear()
+    db.close()
+
+
+def test_get_column_metadata_public_fallback(metadata_db):
+    """An unqualified table name falls back to the 'public.' schema."""
+    metadata = tap_server.get_column_metadata("ztf_dr14")
+    assert set(metadata) == {"ra", "dec"}
+    assert metadata["ra"]["unit"] == "deg"
+    assert metadata["dec"]["ucd"] == "pos.eq.dec"
+    assert tap_server.get_column_metadata("ztf_dr14") is tap_server.get_column_metadata("public.ztf_dr14")
+
+
+def test_get_column_metadata_is_cached(metadata_db):
+    """Repeated lookups are served from the cache until it is cleared."""
+    first = tap_server.get_column_metadata("public.ztf_dr14")
+    metadata_db.insert_column("public.ztf_dr14", "mag", datatype="float", unit="mag")
+
+    assert tap_server.get_column_metadata("public.ztf_dr14") is first
+    assert "mag" not in first
+
+    tap_server.get_column_metadata.cache_clear()
+    assert "mag" in tap_server.get_column_metadata("public.ztf_dr14")
+
+
+def test_cached_column_metadata_is_read_only(metadata_db):
+    """Callers cannot modify the metadata shared through the cache."""
+    metadata = tap_server.get_column_metadata("public.ztf_dr14")
+    with pytest.raises(TypeError):
+        metadata["mag"] = {"unit": "mag"}
+    with pytest.raises(TypeError):
+        metadata["ra"]["unit"] = "rad"
+    assert tap_server.get_column_metadata("public.ztf_dr14")["ra"]["unit"] == "deg"
+
+
+def test_get_column_metadata_unknown_table(metadata_db):
+    """Unknown or empty table names produce empty metadata."""
+    assert tap_server.get_column_metadata("no_such_table") == {}
+    assert tap_server.get_column_metadata("") == {}
+
+
+def test_get_column_metadata_wanted_columns(metadata_db):
+    """Only the requested columns are looked up, and an empty request is short-circuited."""
+    assert set(tap_server.get_column_metadata("ztf_dr14", ["dec", "no_such_column"])) == {"dec"}
+    assert set(tap_server.get_column_metadata("public.ztf_dr14", ["ra", "dec"])) == {"ra", "dec"}
+    assert tap_server.get_column_metadata("public.ztf_dr14", []) == {}
+
+
+def test_public_fallback_only_for_unknown_tables(metadata_db):
+    """A table known under its unqualified name never falls back to 'public.', even without matches."""
+    metadata_db.insert_column("ztf_dr14", "flux", datatype="float")
+    assert set(tap_server.get_column_metadata("ztf_dr14")) == {"flux"}
+    assert tap_server.get_column_metadata("ztf_dr14", ["ra"]) == {}
+
+
+def test_get_column_metadata_many_wanted_columns(metadata_db):
+    """Long lists of wanted columns are looked up in batches, below SQLite's variable limit."""
+    wanted = [f"col_{i}" for i in range(40_000)] + ["ra"]
+    assert set(tap_server.get_column_metadata("ztf_dr14", wanted)) == {"ra"}
+
+
+def test_server_database_is_opened_read_only(tap_schema_db_path):
+    """The server's PRAGMA settings neither change the database file nor allow writes."""
+    db = TAPSchemaDatabase(tap_schema_db_path, qualified="tap_schema", pragmas=tap_server.TAP_SCHEMA_PRAGMAS)
+    assert db.query_tuples("PRAGMA journal_mode") == [("delete",)]
+    with pytest.raises(sqlite3.OperationalError, match="readonly"):
+        db.insert_schema("public")
+    db.close()
+    assert not os.path.exists(tap_schema_db_path + "-wal")
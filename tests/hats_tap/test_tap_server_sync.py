@@ -0,0 +1,147 @@
+"""Tests for the /sync query endpoint of the TAP server."""
+
+import xml.etree.ElementTree as ET  # noqa: N817
+
+import lsdb
+import numpy as np
+import pandas as pd
+import pytest
+from hats_tap import tap_server
+from hats_tap.tap_schema_db import TAPSchemaDatabase
+
+NS = {"vot": "http://www.ivoa.net/xml/VOTable/v1.4"}
+
+CONE_QUERY = """
+SELECT TOP 10 source_id, ra, dec, mag, flag
+FROM gaia_dr3.gaia
+WHERE 1 = CONTAINS(POINT('ICRS', ra, dec), CIRCLE('ICRS', 270.0, 23.0, 1.0))
+AND mag < 16
+AND flag = 'VARIABLE'
+"""
+
+
+@pytest.fixture(scope="module")
+def catalog_root(tmp_path_factory):
+    """Write a small HATS catalog to a temporary catalog root."""
+    root = tmp_path_factory.mktemp("hats")
+    n = 100
+    df = pd.DataFrame(
+        {
+            "source_id": np.arange(n),
+            "ra": np.linspace(260, 280, n),
+            "dec": np.linspace(15, 30, n),
+            "mag": np.linspace(10, 20, n),
+            "flag": ["VARIABLE" if i % 2 else "CONSTANT" for i in range(n)],
+        }
+    )
+    catalog = lsdb.from_dataframe(df, catalog_name="gaia", ra_column="ra", dec_column="dec")
+    catalog.write_catalog(root / "gaia_dr3" / "gaia")
+    return root
+
+
+@pytest.fixture
+def client(app, catalog_root, tmp_path, monkeypatch):
+    """Flask test client serving the temporary catalog root."""
+    db = TAPSchemaDatabase(str(tmp_path / "tap_schema.db"), qualified="tap_schema")
+    db.initialize_schema()
+    monkeypatch.setattr(tap_server, "tap_schema_db", db)
+    monkeypatch.setattr(tap_server, "CATALOG_PREFIX", str(catalog_root))
+    tap_server.clear_cache()
+
+    yield app.test_client()
+    tap_server.clear_cache()
+    db.close()
+
+
+def _rows(xml_bytes):
+    root = ET.fromstring(xml_bytes)
+    return [[td.text or "" for td in tr.iterfind("vot:TD", NS)] for tr in root.iterfind(".//vot:TR", NS)]
+
+
+def test_sync_query_applies_search_and_filters(client):
+    """Cone search, conditions and column selection are applied to the catalog."""
+    response = client.post("/sync", data={"REQUEST": "doQuery", "LANG": "ADQL", "QUERY": CONE_QUERY})
+    assert response.status_code == 200
+
+    rows = _rows(response.data)
+    assert [row[0] for row in rows] == ["47", "49", "51", "53"]
+    assert all(row[4] == "VARIABLE" for row in rows)
+    assert all(float(row[3]) < 16 for row in rows)
+
+
+def test_columns_and_filters_are_pushed_down(client, monkeypatch):
+    """The selected columns and the conditions are passed to the catalog reader, not applied afterwards."""
+    calls = []
+    open_catalog = lsdb.open_catalog
+
+    def recording_open_catalog(*args, **kwargs):
+        calls.append(kwargs)
+        return open_catalog(*args, **kwargs)
+
+    monkeypatch.setattr(lsdb, "open_catalog", recording_open_catalog)
+
+    response = client.get("/sync", query_string={"REQUEST": "doQuery", "LANG": "ADQL", "QUERY": CONE_QUERY})
+    assert response.status_code == 200
+    (kwargs,) = calls
+    assert kwargs["columns"] == ["source_id", "ra", "dec", "mag", "flag"]
+    assert kwargs["filters"] == [("mag", "<", 16), ("flag", "==", "VARIABLE")]
+    assert isinstance(kwargs["search_filter"], lsdb.ConeSearch)
+
+
+def test_clear_cache_is_not_an_endpoint(client):
+    """Caches can only be cleared from within the server process, not by clients."""
+    assert client.post("/admin/clear-cache").status_code == 404
+
+
+def test_sync_rejects_invalid_request(client):
+    """A missing or wrong REQUEST parameter is reported as a VOTable error."""
+    response = client.get("/sync", query_string={"QUERY": CONE_QUERY})
+    assert response.status_code == 400
+    root = ET.fromstring(response.data)
+    status = root.find("vot:RESOURCE/vot:INFO[@name='QUERY_STATUS']", NS)
+    assert status.get("value") == "ERROR"
+
+
+@pytest.mark.parametrize(
+    ("query", "expected"),
+    [
+        ("SELECT * FROM TAP_SCHEMA.tables", True),
+        ("select table_name from tap_schema.columns", True),
+        (CONE_QUERY, False),
+        ("", False),
+        (None, False),
+    ],
+)
+def test_is_tap_schema_query(query, expected):
+    """TAP_SCHEMA tables are detected regardless of case."""
+    assert tap_server.is_tap_schema_query(query) is expected
+
+
+def test_sync_rejects_unsupported_format_before_querying(client, monkeypatch):
+    """An unsupported FORMAT is rejected without parsing or opening the catalog."""
+
+    def fail(*args, **kwargs):
+        raise AssertionError("the query should not be executed")
+
+    monkeypatch.setattr(tap_server, "parse_adql_entities", fail)
+    monkeypatch.setattr(lsdb, "open_catalog", fail)
+
+    params = {"REQUEST": "doQuery", "LANG": "ADQL", "QUERY": CONE_QUERY, "FORMAT": "csv"}
+    response = client.get("/sync", query_string=params)
+    assert response.status_code == 400
+    root = ET.fromstring(response.data)
+    error = root.find("vot:RESOURCE/vot:INFO[@name='ERROR']", NS)
+    assert error.get("value") == "Unsupported format: csv"
+
+
+def test_sync_reports_header_errors_with_status_500(client, monkeypatch):
+    """Failures before the first row is written are reported as an error VOTable."""
+    # The columns have no TAP_SCHEMA metadata, so building the FIELDs consults the fallbacks
+    monkeypatch.setattr(tap_server, "_FALLBACK_META", None)
+
+    params = {"REQUEST": "doQuery", "LANG": "ADQL", "QUERY": CONE_QUERY}
+    response = client.get("/sync", query_string=params)
+    assert response.status_code == 500
+    root = ET.fromstring(response.data)
+    status = root.find("vot:RESOURCE/vot:INFO[@name='QUERY_STATUS']", NS)
+    assert status.get("value") == "ERROR"
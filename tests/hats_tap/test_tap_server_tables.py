@@ -0,0 +1,122 @@
+"""Tests for the /tables endpoint of the TAP server."""
+
+import functools
+import io
+import os
+import xml.etree.ElementTree as ET  # noqa: N817
+
+import pytest
+from hats_tap import tap_server
+from hats_tap.tap_schema_db import TAPSchemaDatabase
+
+# lxml is not a dependency, so these use the stdlib ElementTree, which caches
+# each compiled path expression itself.
+NS = {"v": "http://www.ivoa.net/xml/VODataService/v1.1"}
+TABLE_TAG = f"{{{NS['v']}}}table"
+
+
+@pytest.fixture(scope="module")
+def client_with_metadata(app, tap_schema_db):
+    """Flask test client backed by the session's Gaia DR3 TAP_SCHEMA database, for read-only tests."""
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr(tap_server, "tap_schema_db", tap_schema_db)
+        yield app.test_client()
+    _parse.cache_clear()
+
+
+@pytest.fixture
+def mutable_client_with_metadata(app, tap_schema_db, tmp_path, monkeypatch):
+    """Like client_with_metadata, but with a copy of the database that the test may modify."""
+    db = TAPSchemaDatabase(str(tmp_path / "tap_schema.db"), qualified="tap_schema")
+    db.connect()
+    tap_schema_db.connection.backup(db.connection)
+    monkeypatch.setattr(tap_server, "tap_schema_db", db)
+
+    yield app.test_client()
+    db.close()
+
+
+@functools.lru_cache(maxsize=8)
+def _parse(xml_bytes):
+    """
+    Parse a tableset document, once per distinct response body.
+
+    The cached tree is shared between callers and must not be modified.
+    """
+    return ET.fromstring(xml_bytes)
+
+
+def _find_tables(root, table_name):
+    """Find the tableset <table> elements whose name is ``table_name``."""
+    return root.findall(f".//v:table[v:name='{table_name}']", NS)
+
+
+def _iter_tables(xml_bytes, table_name):
+    """
+    Stream the tableset <table> elements whose name is ``table_name``.
+
+    For tests that only look at one table: other tables are cleared as soon
+    as they have been parsed, so the document is never held in full.
+    """
+    for _, elem in ET.iterparse(io.BytesIO(xml_bytes), events=("end",)):
+        if elem.tag == TABLE_TAG:
+            if elem.findtext("v:name", namespaces=NS) == table_name:
+                yield elem
+            else:
+                elem.clear()
+
+
+@pytest.mark.parametrize(
+    ("table_name", "column_names"),
+    [
+        ("gaia", ("source_id", "parent_id", "ra", "dec")),
+        ("parent", ("id",)),
+    ],
+)
+def test_tables_endpoint_includes_columns(client_with_metadata, table_name, column_names):
+    """The tableset lists each table once, with its columns."""
+    response = client_with_metadata.get("/tables")
+    assert response.status_code == 200
+    assert response.mimetype == "application/xml"
+
+    tables = _find_tables(_parse(response.data), table_name)
+    assert len(tables) == 1
+    for name in column_names:
+        assert tables[0].find(f"v:column[v:name='{name}']", NS) is not None, name
+
+
+def test_tables_endpoint_includes_column_metadata(client_with_metadata):
+    """Columns carry their unit and UCD."""
+    (table_elem,) = _find_tables(_parse(client_with_metadata.get("/tables").data), "gaia")
+    ra = table_elem.find("v:column[v:name='ra']", NS)
+    assert ra.find("v:unit", NS).text == "deg"
+    assert ra.find("v:ucd", NS).text == "pos.eq.ra"
+
+
+def test_tables_endpoint_is_cached_until_db_changes(mutable_client_with_metadata, monkeypatch):
+    """The tableset is rendered once and re-rendered only after tap_schema.db changes."""
+    calls = []
+    generate = tap_server.generate_tables_xml
+
+    def counting_generate():
+        calls.append(1)
+        return generate()
+
+    monkeypatch.setattr(tap_server, "generate_tables_xml", counting_generate)
+
+    first = mutable_client_with_metadata.get("/tables").data
+    second = mutable_client_with_metadata.get("/tables").data
+    assert first == second
+    assert len(calls) == 1
+
+    # Simulate a re-import of the metadata, which changes the file's mtime
+    db = tap_server.tap_schema_db
+    db.insert_column("gaia_dr3.gaia", "phot_g_mean_mag", datatype="float", unit="mag")
+    stat = os.stat(db.db_path)
+    os.utime(db.db_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+    third = mutable_client_with_metadata.get("/tables").data
+    assert len(calls) == 2
+    tables = list(_iter_tables(third, "gaia"))
+    assert len(tables) == 1
+    assert tables[0].find("v:column[v:name='phot_g_mean_mag']", NS) is not None
@@ -0,0 +1,140 @@
+"""Tests for the VOTable documents produced by the TAP server."""
+
+import xml.etree.ElementTree as ET  # noqa: N817
+
+import pandas as pd
+from hats_tap import tap_server
+
+NS = {"vot": "http://www.ivoa.net/xml/VOTable/v1.4"}
+
+
+def test_votable_response_is_well_formed():
+    """Rows, fields and INFO elements round-trip through an XML parser."""
+    data = [
+        {"ra": 270.5, "dec": -23.25, "flag": "A&B <1>"},
+        {"ra": 271.0, "dec": None, "flag": ""},
+    ]
+    column_metadata = {"ra": {"datatype": "double", "unit": "deg", "ucd": "pos.eq.ra;meta.main"}}
+    xml = tap_server.create_votable_response(
+        data,
+        ["ra", "dec", "flag"],
+        {"query": "SELECT ra FROM t -- <TABLEDATA />", "table": "t"},
+        column_metadata,
+    )
+    assert xml.startswith('<?xml version="1.0" encoding="UTF-8"?>\n')
+
+    root = ET.fromstring(xml)
+    infos = {info.get("name"): info.get("value") for info in root.iterfind("vot:RESOURCE/vot:INFO", NS)}
+    assert infos["QUERY_STATUS"] == "OK"
+    assert infos["QUERY"] == "SELECT ra FROM t -- <TABLEDATA />"
+
+    fields = root.findall(".//vot:FIELD", NS)
+    assert [field.get("name") for field in fields] == ["ra", "dec", "flag"]
+    assert fields[0].get("unit") == "deg"
+    assert fields[0].get("ucd") == "pos.eq.ra;meta.main"
+    # Fallback metadata for a well-known astronomical column
+    assert fields[1].get("ucd") == "pos.eq.dec;meta.main"
+
+    rows = [[td.text or "" for td in tr.iterfind("vot:TD", NS)] for tr in root.iterfind(".//vot:TR", NS)]
+    assert rows == [["270.5", "-23.25", "A&B <1>"], ["271.0", "", ""]]
+
+
+def test_error_votable():
+    """Error documents carry the status, message and query."""
+    root = ET.fromstring(tap_server.create_error_votable('Bad "thing" <here>', "SELECT 1"))
+    infos = {info.get("name"): info.get("value") for info in root.iterfind("vot:RESOURCE/vot:INFO", NS)}
+    assert infos == {"QUERY_STATUS": "ERROR", "ERROR": 'Bad "thing" <here>', "QUERY": "SELECT 1"}
+
+
+def test_votable_response_from_dataframe():
+    """DataFrame results are written column-wise with the same cell formatting."""
+    df = pd.DataFrame(
+        {"source_id": [1, 2], "mag": [16.5, None], "flag": pd.Series(["VARIABLE", None], dtype=object)}
+    )
+    data, columns = tap_server.dataframe_to_votable_data(df)
+    xml = tap_server.create_votable_response(data, columns, {"query": "", "table": "t"})
+
+    root = ET.fromstring(xml)
+    rows = [[td.text or "" for td in tr.iterfind("vot:TD", NS)] for tr in root.iterfind(".//vot:TR", NS)]
+    assert rows == [["1", "16.5", "VARIABLE"], ["2", "nan", ""]]
+
+
+def test_votable_response_from_dataframe_with_pandas_dtypes():
+    """Datetime and nullable columns are written as they were from DataFrame.to_dict("records")."""
+    df = pd.DataFrame(
+        {
+            "obs_time": pd.to_datetime(["2020-01-01", None]),
+            "exposure": pd.to_timedelta(["30s", None]),
+            "n_obs": pd.array([3, None], dtype="Int64"),
+        }
+    )
+    data, columns = tap_server.dataframe_to_votable_data(df)
+
+    def rows(data):
+        root = ET.fromstring(tap_server.create_votable_response(data, columns, {"query": "", "table": "t"}))
+        return [[td.text or "" for td in tr.iterfind("vot:TD", NS)] for tr in root.iterfind(".//vot:TR", NS)]
+
+    assert rows(data) == [["2020-01-01 00:00:00", "0 days 00:00:30", "3"], ["NaT", "NaT", ""]]
+    assert rows(data) == rows(df.to_dict("records"))
+
+
+def test_prebuilt_error_votables_match_create_error_votable():
+    """The error templates render exactly what create_error_votable would."""
+    value = 'a&b <"c">\n\t\r$x'
+    assert tap_server._ERR_INVALID_REQUEST_XML_TEMPLATE.substitute(
+        value=tap_server._escape_attr(value)
+    ) == tap_server.create_error_votable(f"Invalid REQUEST parameter: {value}. Must be 'doQuery'.")
+    assert tap_server._ERR_UNSUPPORTED_FORMAT_XML_TEMPLATE.substitute(
+        value=tap_server._escape_attr(value), query=tap_server._escape_attr(value)
+    ) == tap_server.create_error_votable(f"Unsupported format: {value}", value)
+    assert (
+        tap_server.create_error_votable("Missing required parameter: QUERY")
+        == tap_server._ERR_MISSING_QUERY_XML
+    )
+
+
+def test_stream_votable_yields_row_chunks(monkeypatch):
+    """Rows are streamed in chunks that concatenate to the full document."""
+    monkeypatch.setattr(tap_server, "VOTABLE_ROWS_PER_CHUNK", 2)
+    df = pd.DataFrame({"source_id": range(5), "ra": [270.0 + i for i in range(5)]})
+    query_info = {"query": "", "table": "t"}
+
+    chunks = list(tap_server.stream_votable(df, ["source_id", "ra"], query_info))
+    # Header, three chunks of at most two rows, and the closing tags
+    assert len(chunks) == 5
+    assert [chunk.count("<TR>") for chunk in chunks] == [0, 2, 2, 1, 0]
+
+    root = ET.fromstring("".join(chunks))
+    rows = [[td.text for td in tr.iterfind("vot:TD", NS)] for tr in root.iterfind(".//vot:TR", NS)]
+    assert rows == [[str(i), str(270.0 + i)] for i in range(5)]
+
+
+def test_stream_votable_reports_row_errors(monkeypatch):
+    """A failure while writing rows closes the document with a trailing error status."""
+    monkeypatch.setattr(tap_server, "VOTABLE_ROWS_PER_CHUNK", 2)
+
+    def rows():
+        yield {"source_id": 1}
+        yield {"source_id": 2}
+        raise ValueError("partition could not be read")
+
+    xml = tap_server.create_votable_response(rows(), ["source_id"], {"query": "", "table": "t"})
+    root = ET.fromstring(xml)
+    assert [td.text for td in root.iterfind(".//vot:TD", NS)] == ["1", "2"]
+    # The leading status was sent before the rows; the trailing INFO elements report the failure
+    infos = [(info.get("name"), info.get("value")) for info in root.iterfind("vot:RESOURCE/vot:INFO", NS)]
+    assert infos[0] == ("QUERY_STATUS", "OK")
+    assert infos[-2:] == [
+        ("QUERY_STATUS", "ERROR"),
+        ("ERROR", "Error writing query results: partition could not be read"),
+    ]
+
+
+def test_missing_metadata_warning_is_aggregated(caplog):
+    """Columns without metadata are reported in a single warning per response."""
+    with caplog.at_level("WARNING", logger=tap_server.app.logger.name):
+        tap_server.create_votable_response([], ["ra", "dec", "flag"], {"query": "", "table": "t"})
+    warnings = [record.getMessage() for record in caplog.records if "Missing metadata" in record.getMessage()]
+    assert warnings == [
+        "Missing metadata for columns ['ra', 'dec', 'flag'] in table 't'. Using fallback values."
+    ]
@@ -7,4 +7,32 @@ def test_wsgi_app_exports():
     """The tap_server module should expose a WSGI callable for gunicorn."""
     wsgi_app = tap_server.create_app()
     assert wsgi_app is tap_server.app
+    assert tap_server.create_app() is wsgi_app
     assert tap_server.application is tap_server.app
+
+
+def test_create_app_warms_up_parser_once(monkeypatch):
+    """The ADQL parser is warmed up by the first create_app() call, not on import."""
+    calls = []
+    monkeypatch.setattr(tap_server, "warm_up_parser", lambda: calls.append(1))
+    tap_server._warm_up_parser_once.cache_clear()
+
+    tap_server.create_app()
+    tap_server.create_app()
+    assert calls == [1]
+
+
+def test_static_endpoints_are_cacheable():
+    """The index page and capabilities document are served with caching headers."""
+    client = tap_server.create_app().test_client()
+
+    index = client.get("/")
+    assert index.status_code == 200
+    assert index.mimetype == "text/html"
+    assert index.headers["Cache-Control"] == "public, max-age=3600"
+    assert b"LSDB TAP Service" in index.data
+
+    capabilities = client.get("/capabilities")
+    assert capabilities.mimetype == "application/xml"
+    assert capabilities.headers["Cache-Control"] == "public, max-age=3600"
+    assert capabilities.data == tap_server.CAPABILITIES_XML.encode("utf-8")